@@ -0,0 +1,218 @@
+"""Time every function in database.crud against synthetic datasets of growing size.
+
+Each size gets a database from benchmarks.dataset, cached in --data-dir and generated when missing
+(1m takes about half a minute, 10m several minutes). Functions run for the heaviest user (user 1)
+and for a median one, writes are rolled back. Timings and the query plans of every function are
+written to --output; pass an earlier output as --baseline to see the change in p50.
+
+    uv run python -m benchmarks.crud [--sizes 10k,1m,10m] [--repeat 50] [--output crud.json] [--baseline old.json]
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import sqlite3
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+from aiogram.types import User as TgUser
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
+from benchmarks.dataset import ensure_dataset
+from benchmarks.query_plans import capture_statements, collect_query_plans, is_full_scan
+from benchmarks.utils import bench_settings, parse_size, summarize
+from bot.enums import Category, ItemStatus
+from database.crud import item as item_crud
+from database.crud import user as user_crud
+from database.crud.item import PAGE_SIZE, NewItem, PageCursor
+from database.db import get_engine, get_session_factory
+from database.models import Item, ItemCounter, User
+
+CATEGORY = Category.BOOKS
+STATUS = ItemStatus.BACKLOG
+
+Run = Callable[[AsyncSession], Awaitable[Any]]
+
+
+@dataclass(frozen=True, slots=True)
+class Case:
+    name: str
+    run: Run
+
+
+async def _offset_page(user_id: int, session: AsyncSession, page: int) -> list[Item]:
+    """A list page the way it was read before keyset pagination, the baseline for get_items_page."""
+    result = await session.execute(
+        select(Item)
+        .where(Item.user_id == user_id, Item.category == CATEGORY, Item.status == STATUS)
+        .order_by(Item.created_at.desc())
+        .offset(page * PAGE_SIZE)
+        .limit(PAGE_SIZE)
+    )
+    return list(result.scalars().all())
+
+
+async def _user_cases(session: AsyncSession, label: str, user_id: int) -> list[Case]:
+    """Cases for one user, with item ids and cursors picked from the user's BOOKS backlog."""
+    filters = (Item.user_id == user_id, Item.category == CATEGORY, Item.status == STATUS)
+    total = (await session.execute(select(func.count()).where(*filters))).scalar_one()
+    middle = (
+        await session.execute(
+            select(Item).where(*filters).order_by(Item.created_at.desc(), Item.id.desc()).offset(total // 2).limit(1)
+        )
+    ).scalar_one()
+    cursor = PageCursor.of(middle)
+    # The start of a word the user has in titles, like someone looking for an item they remember
+    prefix = middle.title.split()[0][:4]
+    middle_page = total // 2 // PAGE_SIZE
+    item_id = middle.id
+    tg_user = TgUser(id=user_id, is_bot=False, first_name="Renamed", username="renamed")
+    new_items = [NewItem(f"Imported item {n}", CATEGORY) for n in range(100)]
+    title_keys = [f"new item {n}" for n in range(20)]
+
+    async def _stream_items(s: AsyncSession) -> int:
+        return sum([len(rows) async for rows in item_crud.stream_items(user_id, s, category=CATEGORY)])
+
+    async def _update_user(s: AsyncSession) -> None:
+        user = await user_crud.get_user(user_id, s)
+        await user_crud.update_user(user, tg_user, s)
+
+    cases = [
+        Case("get_user", lambda s: user_crud.get_user(user_id, s)),
+        Case("update_user", _update_user),
+        Case("get_item", lambda s: item_crud.get_item(item_id, s)),
+        Case("offset_page[first]", lambda s: _offset_page(user_id, s, 0)),
+        Case("offset_page[middle]", lambda s: _offset_page(user_id, s, middle_page)),
+        Case("get_items_page[first]", lambda s: item_crud.get_items_page(user_id, CATEGORY, STATUS, s)),
+        Case(
+            "get_items_page[middle]",
+            lambda s: item_crud.get_items_page(user_id, CATEGORY, STATUS, s, cursor=cursor),
+        ),
+        Case(
+            "get_items_page[backward]",
+            lambda s: item_crud.get_items_page(user_id, CATEGORY, STATUS, s, cursor=cursor._replace(backward=True)),
+        ),
+        Case("search_items", lambda s: item_crud.search_items(user_id, prefix, s)),
+        Case("stream_items[category]", _stream_items),
+        Case("get_items_count", lambda s: item_crud.get_items_count(user_id, CATEGORY, STATUS, s)),
+        Case("get_item_counts", lambda s: item_crud.get_item_counts(user_id, s)),
+        Case("create_item", lambda s: item_crud.create_item(user_id, "New item", CATEGORY, s)),
+        Case("create_items[100]", lambda s: item_crud.create_items(user_id, new_items, s)),
+        Case("get_item_keys", lambda s: item_crud.get_item_keys(user_id, s)),
+        Case("get_title_keys[20]", lambda s: item_crud.get_title_keys(user_id, CATEGORY, title_keys, s)),
+        Case("log_item", lambda s: item_crud.log_item(item_id, s)),
+        Case("update_item_title", lambda s: item_crud.update_item_title(item_id, "New title", s)),
+        Case("delete_item", lambda s: item_crud.delete_item(item_id, s)),
+    ]
+    return [Case(f"{case.name} {label}", case.run) for case in cases]
+
+
+async def _median_user(session: AsyncSession) -> int:
+    """The user in the middle by the size of the benchmarked list, among those who have one."""
+    per_user = (
+        select(ItemCounter.user_id, func.sum(ItemCounter.count).label("n"))
+        .where(ItemCounter.category == CATEGORY, ItemCounter.status == STATUS)
+        .group_by(ItemCounter.user_id)
+        .subquery()
+    )
+    listed = (await session.execute(select(func.count()).select_from(per_user))).scalar_one()
+    result = await session.execute(select(per_user.c.user_id).order_by(per_user.c.n).offset(listed // 2).limit(1))
+    return result.scalar_one()
+
+
+async def _cases(session_factory: async_sessionmaker[AsyncSession], users: int) -> list[Case]:
+    new_user = TgUser(id=users + 1, is_bot=False, first_name="New", username="new")
+    cases = [Case("create_user", lambda s: user_crud.create_user(new_user, s))]
+    async with session_factory() as session:
+        cases += await _user_cases(session, "(heavy)", 1)
+        cases += await _user_cases(session, "(median)", await _median_user(session))
+    return cases
+
+
+async def _time_case(session_factory: async_sessionmaker[AsyncSession], case: Case, repeat: int) -> list[float]:
+    timings = []
+    # The first run warms the page cache and the statement cache
+    for _ in range(repeat + 1):
+        async with session_factory() as session, session.begin():
+            start = time.perf_counter()
+            await case.run(session)
+            timings.append((time.perf_counter() - start) * 1000)
+            await session.rollback()
+    return timings[1:]
+
+
+async def _plans(engine: AsyncEngine, session_factory: async_sessionmaker[AsyncSession], case: Case) -> list[dict]:
+    with capture_statements(engine) as statements:
+        async with session_factory() as session, session.begin():
+            await case.run(session)
+            await session.rollback()
+    plans = await collect_query_plans(engine, statements)
+    return [
+        {"sql": " ".join(sql.split()), "plan": plan, "full_scan": is_full_scan(plan)} for sql, plan in plans.items()
+    ]
+
+
+async def bench_size(items: int, data_dir: Path, repeat: int) -> dict[str, Any]:
+    db_path = await ensure_dataset(data_dir, items)
+    engine = get_engine(bench_settings(db_path, db_slow_query_ms=0))
+    session_factory = get_session_factory(engine)
+    results = {}
+    try:
+        async with session_factory() as session:
+            users = (await session.execute(select(func.count()).select_from(User))).scalar_one()
+        for case in await _cases(session_factory, users):
+            timings = await _time_case(session_factory, case, repeat)
+            results[case.name] = {**summarize(timings), "queries": await _plans(engine, session_factory, case)}
+    finally:
+        await engine.dispose()
+    return {"items": items, "users": users, "functions": results}
+
+
+def _print_size(size: str, result: dict[str, Any], baseline: dict[str, Any] | None) -> None:
+    print(f"\n{size}: {result['items']:,} items, {result['users']:,} users")
+    print(f"{'function':<38}{'mean':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'vs base':>10}  (ms)")
+    for name, r in result["functions"].items():
+        delta = ""
+        if baseline and (base := baseline["functions"].get(name)) and base["p50"]:
+            delta = f"{(r['p50'] - base['p50']) / base['p50']:+.0%}"
+        scan = "  SCAN" if any(query["full_scan"] for query in r["queries"]) else ""
+        print(f"{name:<38}{r['mean']:>9.2f}{r['p50']:>9.2f}{r['p95']:>9.2f}{r['p99']:>9.2f}{delta:>10}{scan}")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10k", help="comma separated item counts, e.g. 10k,1m,10m")
+    parser.add_argument("--data-dir", type=Path, default=Path("data/bench"))
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--output", type=Path, help="write the results as JSON")
+    parser.add_argument("--baseline", type=Path, help="results of an earlier run to compare against")
+    args = parser.parse_args()
+
+    baseline = json.loads(args.baseline.read_text())["results"] if args.baseline else {}
+    output = {
+        "meta": {
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "repeat": args.repeat,
+        },
+        "results": {},
+    }
+    for size in args.sizes.split(","):
+        size = size.strip().lower()
+        result = await bench_size(parse_size(size), args.data_dir, args.repeat)
+        output["results"][size] = result
+        _print_size(size, result, baseline.get(size))
+
+    if args.output:
+        args.output.write_text(json.dumps(output, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
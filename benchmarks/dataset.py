@@ -0,0 +1,175 @@
+"""Fill a SQLite database with synthetic users and items.
+
+Items are spread over users by a power law (user 1 owns the most, then user 2, ...), over all
+categories, and over the last --years years, with a --logged share of them logged. Titles are one to
+four words from a made-up vocabulary, common words far more common than rare ones, like real titles.
+Counter and search triggers are dropped for the load, and the counters and the search index rebuilt
+in one pass afterwards.
+
+    uv run python -m benchmarks.dataset data/bench.db --items 1000000 [--users 10000] [--years 10]
+"""
+
+import argparse
+import asyncio
+import itertools
+import random
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from benchmarks.utils import bench_settings
+from bot.enums import Category, ItemStatus, SynchronousMode
+from bot.main import init_db
+from database.db import get_engine
+from database.models import ITEM_COUNTER_TRIGGERS, ITEM_SEARCH_TRIGGERS, title_key
+
+CHUNK = 50_000
+VOCABULARY_SIZE = 20_000
+LETTERS = "abcdefghijklmnopqrstuvwxyz"
+# Books and movies are what most people track
+CATEGORY_WEIGHTS = {Category.BOOKS: 4, Category.MOVIES: 3, Category.SERIES: 2, Category.GAMES: 1}
+
+
+@dataclass(frozen=True, slots=True)
+class DatasetSpec:
+    users: int
+    items: int
+    years: int = 10
+    skew: float = 1.1  # power law exponent of items per user rank
+    logged: float = 0.6  # share of logged items
+    seed: int = 0
+
+
+def default_users(items: int) -> int:
+    return max(100, items // 100)
+
+
+def _user_rows(spec: DatasetSpec) -> list[tuple]:
+    return [(user_id, f"User {user_id}", f"user{user_id}") for user_id in range(1, spec.users + 1)]
+
+
+def _zipf_weights(n: int, skew: float) -> list[float]:
+    return list(itertools.accumulate(1 / rank**skew for rank in range(1, n + 1)))
+
+
+def vocabulary(seed: int = 0) -> list[str]:
+    """Made-up words, the most common first: titles draw them with Zipf weights by position."""
+    rng = random.Random(seed)
+    words = sorted({"".join(rng.choices(LETTERS, k=rng.randint(3, 10))) for _ in range(VOCABULARY_SIZE)})
+    rng.shuffle(words)
+    return words
+
+
+def _item_rows(spec: DatasetSpec) -> itertools.chain:
+    rng = random.Random(spec.seed)
+    user_ids = range(1, spec.users + 1)
+    user_weights = _zipf_weights(spec.users, spec.skew)
+    words = vocabulary(spec.seed)
+    word_weights = _zipf_weights(len(words), 1.0)
+    categories = [category.name for category in CATEGORY_WEIGHTS]
+    category_weights = list(itertools.accumulate(CATEGORY_WEIGHTS.values()))
+    end = datetime.now().replace(microsecond=0)
+    span = int(timedelta(days=365 * spec.years).total_seconds())
+
+    def _chunk(size: int):
+        owners = rng.choices(user_ids, cum_weights=user_weights, k=size)
+        kinds = rng.choices(categories, cum_weights=category_weights, k=size)
+        title_words = iter(rng.choices(words, cum_weights=word_weights, k=size * 4))
+        for user_id, category in zip(owners, kinds, strict=True):
+            title = " ".join(itertools.islice(title_words, rng.randint(1, 4))).capitalize()
+            status = ItemStatus.LOGGED.name if rng.random() < spec.logged else ItemStatus.BACKLOG.name
+            # Same text format as the server default, see PageCursor.key
+            created_at = (end - timedelta(seconds=rng.randrange(span))).strftime("%Y-%m-%d %H:%M:%S")
+            yield user_id, title, title_key(title), category, status, created_at
+
+    return itertools.chain.from_iterable(
+        _chunk(min(CHUNK, spec.items - first)) for first in range(0, spec.items, CHUNK)
+    )
+
+
+async def generate(engine: AsyncEngine, spec: DatasetSpec) -> None:
+    await init_db(engine)
+    async with engine.begin() as conn:
+        for name in (*ITEM_COUNTER_TRIGGERS, *ITEM_SEARCH_TRIGGERS):
+            await conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {name}")
+        await conn.exec_driver_sql("INSERT INTO users (id, fullname, username) VALUES (?, ?, ?)", _user_rows(spec))
+
+    rows = _item_rows(spec)
+    written = 0
+    start = time.perf_counter()
+    while batch := list(itertools.islice(rows, CHUNK)):
+        async with engine.begin() as conn:
+            await conn.exec_driver_sql(
+                "INSERT INTO items (user_id, title, title_key, category, status, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                batch,
+            )
+        written += len(batch)
+        if written % 1_000_000 < CHUNK:
+            print(f"  {written:,} items, {written / (time.perf_counter() - start):,.0f}/s")
+
+    # Puts the triggers back, counts and indexes the items loaded without them
+    await init_db(engine)
+    async with engine.connect() as conn:
+        await conn.execute(text("ANALYZE"))
+
+
+async def create_dataset(db_path: Path, spec: DatasetSpec) -> None:
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    engine = get_engine(bench_settings(db_path, db_synchronous=SynchronousMode.OFF, db_slow_query_ms=0))
+    try:
+        await generate(engine, spec)
+    finally:
+        await engine.dispose()
+
+
+async def ensure_dataset(data_dir: Path, items: int) -> Path:
+    """Path of a cached dataset with this many items and the default spec.
+
+    Generated when missing, brought up to the current schema otherwise.
+    """
+    db_path = data_dir / f"items_{items}.db"
+    if not db_path.exists():
+        print(f"Generating {db_path} ...")
+        await create_dataset(db_path, DatasetSpec(users=default_users(items), items=items))
+        return db_path
+
+    engine = get_engine(bench_settings(db_path, db_slow_query_ms=0))
+    try:
+        await init_db(engine)
+    finally:
+        await engine.dispose()
+    return db_path
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("db_path", type=Path)
+    parser.add_argument("--items", type=int, default=10_000)
+    parser.add_argument("--users", type=int, help="default: one per 100 items, at least 100")
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--skew", type=float, default=1.1)
+    parser.add_argument("--logged", type=float, default=0.6)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.db_path.exists():
+        parser.error(f"{args.db_path} already exists")
+    spec = DatasetSpec(
+        users=args.users or default_users(args.items),
+        items=args.items,
+        years=args.years,
+        skew=args.skew,
+        logged=args.logged,
+        seed=args.seed,
+    )
+    start = time.perf_counter()
+    await create_dataset(args.db_path, spec)
+    print(f"{spec.users:,} users, {spec.items:,} items in {time.perf_counter() - start:.1f}s -> {args.db_path}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
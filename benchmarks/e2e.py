@@ -0,0 +1,244 @@
+"""End-to-end load test: synthetic users drive the real dispatcher through a fake Bot API server.
+
+Each user replays start -> category -> add items -> backlog -> next page -> view -> log/edit/delete
+-> stats, waiting for every screen before the next tap. Reports throughput and the latency of every
+step (update delivered -> screen rendered) per handler.
+
+    uv run python -m benchmarks.e2e [--users 50] [--rounds 3] [--mode polling|webhook] [--api-latency 0]
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any
+
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiohttp import web
+
+from benchmarks.fake_api import BOT_USER, FakeBotApi, Screen
+from benchmarks.utils import bench_settings, scratch_db_path, summarize
+from bot.enums import RunMode
+from bot.internal.webhook import create_webhook_app
+from bot.keyboards.inline import ItemCb, MenuCb
+from bot.main import build_app, init_db
+from database.db import get_engine, get_session_factory
+
+SCREEN_TIMEOUT = 10.0
+FIRST_USER_ID = 1_000_000
+
+
+class SyntheticUser:
+    def __init__(self, api: FakeBotApi, user_id: int, rng: random.Random, timings: dict[str, list[float]]):
+        self.api = api
+        self.user = {"id": user_id, "is_bot": False, "first_name": f"User {user_id}"}
+        self.chat = {"id": user_id, "type": "private"}
+        self.rng = rng
+        self.timings = timings
+        self.timeouts: dict[str, int] = defaultdict(int)
+        self.screen: Screen | None = None
+        self._titles = 0
+
+    async def _step(self, step: str, update: dict[str, Any]) -> Screen | None:
+        screens = self.api.screens(self.user["id"])
+        while not screens.empty():
+            screens.get_nowait()
+        start = time.perf_counter()
+        await self.api.deliver({"update_id": self.api.next_update_id(), **update})
+        try:
+            self.screen = await asyncio.wait_for(screens.get(), SCREEN_TIMEOUT)
+        except TimeoutError:
+            self.timeouts[step] += 1
+            return None
+        self.timings[step].append((time.perf_counter() - start) * 1000)
+        return self.screen
+
+    async def send(self, text: str, step: str) -> Screen | None:
+        message = {
+            "message_id": self.api.next_message_id(),
+            "date": int(time.time()),
+            "chat": self.chat,
+            "from": self.user,
+            "text": text,
+        }
+        if text.startswith("/"):
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        return await self._step(step, {"message": message})
+
+    async def tap(self, data: str) -> Screen | None:
+        message = {
+            "message_id": self.screen.message_id,
+            "date": int(time.time()),
+            "chat": self.chat,
+            "from": BOT_USER,
+            "text": self.screen.text,
+        }
+        callback = {
+            "id": str(self.api.next_update_id()),
+            "from": self.user,
+            "chat_instance": str(self.user["id"]),
+            "data": data,
+            "message": message,
+        }
+        prefix, action = data.split(":", 2)[:2]
+        return await self._step(f"{prefix}:{action}", {"callback_query": callback})
+
+    def buttons(self, cb_type: type[MenuCb | ItemCb], **match: Any) -> list[str]:
+        if self.screen is None:
+            return []
+        found = []
+        for data in self.screen.buttons:
+            if not data.startswith(f"{cb_type.__prefix__}:"):
+                continue
+            unpacked = cb_type.unpack(data)
+            if all(getattr(unpacked, key) == value for key, value in match.items()):
+                found.append(data)
+        return found
+
+    async def tap_any(self, cb_type: type[MenuCb | ItemCb], **match: Any) -> bool:
+        if found := self.buttons(cb_type, **match):
+            return await self.tap(self.rng.choice(found)) is not None
+        return False
+
+    def title(self) -> str:
+        self._titles += 1
+        return f"Item {self.user['id']}-{self._titles}"
+
+    async def run_round(self, items: int) -> None:
+        if not await self.send("/start", "/start"):
+            return
+        if not await self.tap_any(MenuCb, action="category"):
+            return
+        for _ in range(items):
+            if not await self.tap_any(ItemCb, action="add_backlog"):
+                return
+            if not await self.send(self.title(), "add title"):
+                return
+
+        if not await self.tap_any(MenuCb, action="backlog"):
+            return
+        pages = [data for data in self.buttons(MenuCb, action="backlog") if MenuCb.unpack(data).cursor]
+        if pages and self.rng.random() < 0.5:
+            await self.tap(pages[0])
+        if not await self.tap_any(ItemCb, action="view"):
+            return
+
+        match self.rng.choice(("log", "edit", "delete")):
+            case "edit":
+                if await self.tap_any(ItemCb, action="edit"):
+                    await self.send(self.title(), "edit title")
+            case action:
+                await self.tap_any(ItemCb, action=action)
+
+        if await self.send("/stats", "/stats"):
+            await self.tap_any(MenuCb, action="stats_year")
+
+    async def run(self, rounds: int, items: int) -> None:
+        for _ in range(rounds):
+            await self.run_round(items)
+
+
+async def _serve_webhook(app, settings) -> web.AppRunner:
+    runner = web.AppRunner(create_webhook_app(app.dp, app.bot, settings), handle_signals=False, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, settings.webhook_host, settings.webhook_port).start()
+    return runner
+
+
+async def run_benchmark(args: argparse.Namespace) -> dict[str, Any]:
+    api = FakeBotApi(latency=args.api_latency / 1000)
+    base_url = await api.start()
+    timings: dict[str, list[float]] = defaultdict(list)
+    users: list[SyntheticUser] = []
+    try:
+        with scratch_db_path() as db_path:
+            overrides = {} if args.rate_limit else {"api_rate_limit": 0}
+            if args.mode == RunMode.WEBHOOK:
+                overrides |= {
+                    "bot_run_mode": RunMode.WEBHOOK,
+                    "webhook_base_url": f"http://127.0.0.1:{args.webhook_port}",
+                    "webhook_host": "127.0.0.1",
+                    "webhook_port": args.webhook_port,
+                }
+            settings = bench_settings(db_path, **overrides)
+            engine = get_engine(settings)
+            await init_db(engine)
+            session = AiohttpSession(api=TelegramAPIServer.from_base(base_url))
+            app = build_app(settings, engine, get_session_factory(engine), session=session)
+
+            if args.mode == RunMode.WEBHOOK:
+                runner = await _serve_webhook(app, settings)
+                stop = runner.cleanup
+            else:
+                polling = asyncio.create_task(app.dp.start_polling(app.bot, polling_timeout=1, handle_signals=False))
+
+                async def stop() -> None:
+                    await app.dp.stop_polling()
+                    await polling
+
+            rng = random.Random(args.seed)
+            users = [
+                SyntheticUser(api, FIRST_USER_ID + n, random.Random(rng.random()), timings) for n in range(args.users)
+            ]
+            start = time.perf_counter()
+            try:
+                await asyncio.gather(*(user.run(args.rounds, args.items) for user in users))
+                elapsed = time.perf_counter() - start
+            finally:
+                await stop()
+                await engine.dispose()
+    finally:
+        await api.stop()
+
+    timeouts: dict[str, int] = defaultdict(int)
+    for user in users:
+        for step, count in user.timeouts.items():
+            timeouts[step] += count
+    steps = sum(len(values) for values in timings.values())
+    return {
+        "mode": str(args.mode),
+        "users": args.users,
+        "elapsed_s": elapsed,
+        "steps": steps,
+        "steps_per_s": steps / elapsed if elapsed else 0.0,
+        "api_calls": dict(api.calls),
+        "handlers": {
+            step: {**summarize(values), "timeouts": timeouts.get(step, 0)} for step, values in sorted(timings.items())
+        },
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--items", type=int, default=3, help="items each user adds per round")
+    parser.add_argument("--mode", type=RunMode, choices=list(RunMode), default=RunMode.POLLING)
+    parser.add_argument("--api-latency", type=float, default=0.0, help="ms added to every Bot API call")
+    parser.add_argument("--rate-limit", action="store_true", help="keep the outbound rate limiter on")
+    parser.add_argument("--webhook-port", type=int, default=18080)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", type=Path, help="also write the results to this file")
+    args = parser.parse_args()
+
+    result = await run_benchmark(args)
+    print(
+        f"{result['users']} users, {result['mode']}: {result['steps']} steps in {result['elapsed_s']:.1f}s "
+        f"({result['steps_per_s']:.0f}/s)"
+    )
+    print(f"{'step':<16}{'count':>7}{'timeouts':>10}{'mean':>9}{'p50':>9}{'p95':>9}{'p99':>9}  (ms)")
+    for step, r in result["handlers"].items():
+        print(
+            f"{step:<16}{r['count']:>7}{r['timeouts']:>10}{r['mean']:>9.1f}{r['p50']:>9.1f}{r['p95']:>9.1f}"
+            f"{r['p99']:>9.1f}"
+        )
+    if args.json:
+        args.json.write_text(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,146 @@
+"""Local stand-in for the Telegram Bot API, for running the bot end to end without Telegram.
+
+Serves getUpdates from a queue of synthetic updates, or posts them to the bot's webhook, and answers
+sendMessage, editMessageText, answerCallbackQuery and friends the way Telegram would. Every screen
+the bot renders is handed to whoever waits on that chat.
+"""
+
+import asyncio
+import itertools
+import json
+import time
+from collections import Counter
+from contextlib import suppress
+from dataclasses import dataclass, field
+from typing import Any
+
+import aiohttp
+from aiohttp import web
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+
+
+@dataclass(slots=True)
+class Screen:
+    """A message the bot sent or edited: its text and the callback data of its buttons."""
+
+    message_id: int
+    text: str
+    buttons: list[str] = field(default_factory=list)
+
+
+def _buttons(reply_markup: str | None) -> list[str]:
+    if not reply_markup:
+        return []
+    markup = json.loads(reply_markup)
+    return [button["callback_data"] for row in markup.get("inline_keyboard", []) for button in row]
+
+
+class FakeBotApi:
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls: Counter[str] = Counter()
+        self.webhook_url: str | None = None
+        self._updates: list[dict[str, Any]] = []
+        self._new_updates = asyncio.Event()
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._screens: dict[int, asyncio.Queue[Screen]] = {}
+        self._runner: web.AppRunner | None = None
+        self._client: aiohttp.ClientSession | None = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Start serving, returns the base URL to point the bot's session at."""
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self._handle)
+        self._runner = web.AppRunner(app, handle_signals=False, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        self._client = aiohttp.ClientSession()
+        host, port = self._runner.addresses[0][:2]
+        return f"http://{host}:{port}"
+
+    async def stop(self) -> None:
+        if self._client is not None:
+            await self._client.close()
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    # Updates from users
+
+    def next_update_id(self) -> int:
+        return next(self._update_ids)
+
+    def next_message_id(self) -> int:
+        return next(self._message_ids)
+
+    def screens(self, chat_id: int) -> asyncio.Queue[Screen]:
+        queue = self._screens.get(chat_id)
+        if queue is None:
+            queue = self._screens[chat_id] = asyncio.Queue()
+        return queue
+
+    async def deliver(self, update: dict[str, Any]) -> None:
+        if self.webhook_url is None:
+            self._updates.append(update)
+            self._new_updates.set()
+            return
+        async with self._client.post(self.webhook_url, json=update) as response:
+            response.raise_for_status()
+            # A method returned by the handler comes back in the response instead of as a request
+            if response.content_type.startswith("multipart/"):
+                fields = {}
+                async for part in aiohttp.MultipartReader.from_response(response):
+                    fields[part.name] = await part.text()
+                await self._call(fields.pop("method"), fields)
+
+    # Requests from the bot
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        params = dict(await request.post())
+        result = await self._call(request.match_info["method"], params)
+        return web.json_response({"ok": True, "result": result})
+
+    async def _call(self, method: str, params: dict[str, Any]) -> Any:
+        self.calls[method] += 1
+        if method == "getUpdates":
+            return await self._get_updates(params)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        match method:
+            case "getMe":
+                return BOT_USER
+            case "setWebhook":
+                self.webhook_url = params["url"]
+            case "deleteWebhook":
+                self.webhook_url = None
+            case "sendMessage":
+                return self._render(int(params["chat_id"]), self.next_message_id(), params)
+            case "editMessageText":
+                return self._render(int(params["chat_id"]), int(params["message_id"]), params)
+        return True
+
+    def _render(self, chat_id: int, message_id: int, params: dict[str, Any]) -> dict[str, Any]:
+        screen = Screen(message_id, params["text"], _buttons(params.get("reply_markup")))
+        self.screens(chat_id).put_nowait(screen)
+        message = {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": BOT_USER,
+            "text": screen.text,
+        }
+        if params.get("reply_markup"):
+            message["reply_markup"] = json.loads(params["reply_markup"])
+        return message
+
+    async def _get_updates(self, params: dict[str, Any]) -> list[dict[str, Any]]:
+        offset = int(params.get("offset", 0))
+        self._updates = [update for update in self._updates if update["update_id"] >= offset]
+        if not self._updates and (timeout := float(params.get("timeout", 0))):
+            self._new_updates.clear()
+            with suppress(TimeoutError):
+                await asyncio.wait_for(self._new_updates.wait(), timeout)
+        return self._updates[: int(params.get("limit", 100))]
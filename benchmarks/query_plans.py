@@ -0,0 +1,113 @@
+"""Check that every CRUD query is served by an index.
+
+Runs the functions from database.crud against a throwaway database, captures the SQL they emit
+and prints EXPLAIN QUERY PLAN for every SELECT. Exits with status 1 if any plan contains a SCAN.
+
+    uv run python -m benchmarks.query_plans
+"""
+
+import asyncio
+import sys
+import tempfile
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+from aiogram.types import User as TgUser
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession, create_async_engine
+
+from bot.enums import Category, ItemStatus
+from bot.main import init_db
+from database.crud import item as item_crud
+from database.crud import user as user_crud
+from database.db import get_session_factory
+
+USER_ID = 1
+
+Statement = tuple[str, tuple]
+
+
+@contextmanager
+def capture_statements(engine: AsyncEngine) -> Iterator[list[Statement]]:
+    """Collect (sql, parameters) of every statement executed on the engine inside the block."""
+    statements: list[Statement] = []
+
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not executemany:
+            statements.append((statement, tuple(parameters)))
+
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+
+
+async def explain(conn: AsyncConnection, statement: str, parameters: tuple) -> list[str]:
+    result = await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+    return [row[-1] for row in result]
+
+
+def is_full_scan(plan: list[str]) -> bool:
+    # A virtual table "SCAN" with an index is the FTS5 index lookup
+    return any(
+        detail.startswith("SCAN") and "CONSTANT ROW" not in detail and "VIRTUAL TABLE INDEX" not in detail
+        for detail in plan
+    )
+
+
+async def collect_query_plans(engine: AsyncEngine, statements: list[Statement]) -> dict[str, list[str]]:
+    plans: dict[str, list[str]] = {}
+    async with engine.connect() as conn:
+        for statement, parameters in statements:
+            if statement.lstrip().upper().startswith("SELECT") and statement not in plans:
+                plans[statement] = await explain(conn, statement, parameters)
+    return plans
+
+
+async def _exercise_crud(session: AsyncSession) -> None:
+    tg_user = TgUser(id=USER_ID, is_bot=False, first_name="Bench")
+    if await user_crud.get_user(USER_ID, session) is None:
+        await user_crud.create_user(tg_user, session)
+
+    item = await item_crud.create_item(USER_ID, "Title", Category.BOOKS, session)
+    await item_crud.get_item(item.id, session)
+    for status in ItemStatus:
+        cursor = item_crud.PageCursor.of(item)
+        await item_crud.get_items_page(USER_ID, Category.BOOKS, status, session, cursor=cursor)
+        await item_crud.get_items_page(USER_ID, Category.BOOKS, status, session, cursor=cursor._replace(backward=True))
+        await item_crud.get_items_count(USER_ID, Category.BOOKS, status, session)
+    await item_crud.search_items(USER_ID, "tit", session)
+    await item_crud.get_title_keys(USER_ID, Category.BOOKS, ["title", "new title"], session)
+    await item_crud.update_item_title(item.id, "New title", session)
+    await item_crud.log_item(item.id, session)
+    await item_crud.get_item_counts(USER_ID, session)
+    await item_crud.delete_item(item.id, session)
+
+
+async def main() -> int:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{Path(tmp) / 'plans.db'}")
+        await init_db(engine)
+        session_factory = get_session_factory(engine)
+
+        with capture_statements(engine) as statements:
+            async with session_factory() as session, session.begin():
+                await _exercise_crud(session)
+
+        plans = await collect_query_plans(engine, statements)
+        await engine.dispose()
+
+    failed = False
+    for statement, plan in plans.items():
+        scan = is_full_scan(plan)
+        failed |= scan
+        print("FAIL" if scan else "ok  ", " ".join(statement.split()))
+        for detail in plan:
+            print("       ", detail)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,114 @@
+"""Time title search (database.crud.item.search_items) on synthetic datasets of growing size.
+
+Queries are built from words in the user's own titles: a whole word, a 2 and a 3 letter prefix, two
+words, and a word nobody has. Each runs for the heaviest user (user 1) and for a user with a typical
+number of items. Exits with status 1 if any kind of query has a p99 over --budget ms.
+
+    uv run python -m benchmarks.search [--sizes 10k,1m,10m] [--queries 50] [--budget 10]
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from benchmarks.dataset import ensure_dataset
+from benchmarks.utils import bench_settings, parse_size, summarize
+from database.crud.item import search_items
+from database.db import get_engine, get_session_factory
+from database.models import Item, User
+
+HEAVY_USER_ID = 1
+
+
+def _queries(titles: list[str], rng: random.Random, count: int) -> dict[str, list[str]]:
+    queries: dict[str, list[str]] = defaultdict(list)
+    for _ in range(count):
+        words = rng.choice(titles).lower().split()
+        word = rng.choice(words)
+        queries["word"].append(word)
+        queries["prefix 2"].append(word[:2])
+        queries["prefix 3"].append(word[:3])
+        if len(words) > 1:
+            queries["two words"].append(" ".join(words[:2]))
+        queries["no match"].append(f"{word}qx")
+    return queries
+
+
+async def _titles(session: AsyncSession, user_id: int, rng: random.Random, count: int) -> list[str]:
+    result = await session.execute(select(Item.id, Item.title).where(Item.user_id == user_id))
+    rows = result.all()
+    return [title for _, title in rng.sample(rows, min(count, len(rows)))]
+
+
+async def bench_size(items: int, data_dir: Path, count: int, seed: int) -> dict[str, Any]:
+    db_path = await ensure_dataset(data_dir, items)
+    engine = get_engine(bench_settings(db_path, db_slow_query_ms=0))
+    session_factory = get_session_factory(engine)
+    rng = random.Random(seed)
+    results: dict[str, Any] = {}
+    try:
+        async with session_factory() as session:
+            users = (await session.execute(select(func.count()).select_from(User))).scalar_one()
+            # Users are ranked by item count, see benchmarks.dataset
+            typical_user_id = max(HEAVY_USER_ID, users // 10)
+            owned = dict((await session.execute(select(Item.user_id, func.count()).group_by(Item.user_id))).all())
+
+            for label, user_id in (("heavy", HEAVY_USER_ID), ("typical", typical_user_id)):
+                titles = await _titles(session, user_id, rng, count)
+                for kind, queries in _queries(titles, rng, count).items():
+                    timings, found = [], 0
+                    for query in queries:
+                        start = time.perf_counter()
+                        found += len(await search_items(user_id, query, session))
+                        timings.append((time.perf_counter() - start) * 1000)
+                    results[f"{kind} ({label}, {owned[user_id]:,} items)"] = {
+                        **summarize(timings),
+                        "max": max(timings),
+                        "avg_results": found / len(queries),
+                    }
+    finally:
+        await engine.dispose()
+    return {"items": items, "users": users, "queries": results}
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10k", help="comma separated item counts, e.g. 10k,1m,10m")
+    parser.add_argument("--data-dir", type=Path, default=Path("data/bench"))
+    parser.add_argument("--queries", type=int, default=50, help="queries of each kind per user")
+    parser.add_argument("--budget", type=float, default=10.0, help="p99 latency allowed, ms")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, help="write the results as JSON")
+    args = parser.parse_args()
+
+    output = {}
+    over_budget = False
+    for size in args.sizes.split(","):
+        size = size.strip().lower()
+        result = output[size] = await bench_size(parse_size(size), args.data_dir, args.queries, args.seed)
+        print(f"\n{size}: {result['items']:,} items, {result['users']:,} users")
+        print(f"{'query':<40}{'mean':>8}{'p50':>8}{'p95':>8}{'p99':>8}{'max':>8}{'results':>9}  (ms)")
+        for name, r in result["queries"].items():
+            slow = r["p99"] > args.budget
+            over_budget |= slow
+            print(
+                f"{name:<40}{r['mean']:>8.2f}{r['p50']:>8.2f}{r['p95']:>8.2f}{r['p99']:>8.2f}{r['max']:>8.2f}"
+                f"{r['avg_results']:>9.1f}{'  SLOW' if slow else ''}"
+            )
+
+    if args.output:
+        args.output.write_text(json.dumps(output, indent=2))
+    return 1 if over_budget else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,110 @@
+"""Compare SQLite durability profiles: commit latency and read throughput next to a busy writer.
+
+uv run python -m benchmarks.sqlite_profiles [--commits 500] [--duration 3] [--readers 4]
+"""
+
+import argparse
+import asyncio
+import time
+
+from aiogram.types import User as TgUser
+
+from benchmarks.utils import bench_settings, scratch_db_path, summarize
+from bot.enums import Category, ItemStatus, JournalMode, SynchronousMode
+from bot.main import init_db
+from database.crud.item import create_item, get_item_counts, get_items_page
+from database.crud.user import create_user
+from database.db import get_engine, get_session_factory
+
+USER_ID = 1
+SEED_ITEMS = 5_000
+
+PROFILES = {
+    "delete/full": {"db_journal_mode": JournalMode.DELETE, "db_synchronous": SynchronousMode.FULL, "db_mmap_size": 0},
+    "wal/full": {"db_journal_mode": JournalMode.WAL, "db_synchronous": SynchronousMode.FULL},
+    "wal/normal": {"db_journal_mode": JournalMode.WAL, "db_synchronous": SynchronousMode.NORMAL},
+    "wal/normal, no mmap": {
+        "db_journal_mode": JournalMode.WAL,
+        "db_synchronous": SynchronousMode.NORMAL,
+        "db_mmap_size": 0,
+    },
+}
+
+
+async def _seed(session_factory) -> None:
+    async with session_factory() as session, session.begin():
+        await create_user(TgUser(id=USER_ID, is_bot=False, first_name="Bench"), session)
+        for i in range(SEED_ITEMS):
+            await create_item(USER_ID, f"Item {i}", list(Category)[i % len(Category)], session)
+
+
+async def _commit(session_factory, n: int) -> None:
+    async with session_factory() as session, session.begin():
+        await create_item(USER_ID, f"New {n}", Category.BOOKS, session)
+
+
+async def bench_commits(session_factory, commits: int) -> dict[str, float]:
+    timings = []
+    for n in range(commits):
+        start = time.perf_counter()
+        await _commit(session_factory, n)
+        timings.append((time.perf_counter() - start) * 1000)
+    return summarize(timings)
+
+
+async def bench_concurrent_reads(session_factory, duration: float, readers: int) -> dict[str, float]:
+    deadline = time.perf_counter() + duration
+    reads = 0
+    writes = 0
+
+    async def _reader() -> None:
+        nonlocal reads
+        while time.perf_counter() < deadline:
+            async with session_factory() as session:
+                await get_items_page(USER_ID, Category.BOOKS, ItemStatus.BACKLOG, session)
+                await get_item_counts(USER_ID, session)
+            reads += 1
+
+    async def _writer() -> None:
+        nonlocal writes
+        while time.perf_counter() < deadline:
+            await _commit(session_factory, writes)
+            writes += 1
+
+    await asyncio.gather(_writer(), *(_reader() for _ in range(readers)))
+    return {"reads_per_s": reads / duration, "writes_per_s": writes / duration}
+
+
+async def bench_profile(overrides: dict, args: argparse.Namespace) -> dict[str, float]:
+    with scratch_db_path() as db_path:
+        settings = bench_settings(db_path, **overrides)
+        engine = get_engine(settings)
+        session_factory = get_session_factory(engine)
+        try:
+            await init_db(engine)
+            await _seed(session_factory)
+            commits = await bench_commits(session_factory, args.commits)
+            concurrent = await bench_concurrent_reads(session_factory, args.duration, args.readers)
+        finally:
+            await engine.dispose()
+    return {**{f"commit_{k}": v for k, v in commits.items() if k != "count"}, **concurrent}
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--commits", type=int, default=500)
+    parser.add_argument("--duration", type=float, default=3.0)
+    parser.add_argument("--readers", type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"{'profile':<22}{'commit mean':>12}{'p50':>9}{'p95':>9}{'p99':>9}{'reads/s':>10}{'writes/s':>10}  (ms)")
+    for name, overrides in PROFILES.items():
+        r = await bench_profile(overrides, args)
+        print(
+            f"{name:<22}{r['commit_mean']:>12.2f}{r['commit_p50']:>9.2f}{r['commit_p95']:>9.2f}"
+            f"{r['commit_p99']:>9.2f}{r['reads_per_s']:>10.0f}{r['writes_per_s']:>10.0f}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
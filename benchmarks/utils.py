@@ -0,0 +1,46 @@
+import statistics
+import tempfile
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+from bot.config import Settings
+
+SIZE_SUFFIXES = {"k": 1_000, "m": 1_000_000}
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Nearest-rank percentile, q in [0, 100]."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(q / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def summarize(timings_ms: list[float]) -> dict[str, float]:
+    return {
+        "count": len(timings_ms),
+        "mean": statistics.fmean(timings_ms) if timings_ms else 0.0,
+        "p50": percentile(timings_ms, 50),
+        "p95": percentile(timings_ms, 95),
+        "p99": percentile(timings_ms, 99),
+    }
+
+
+def parse_size(value: str) -> int:
+    """Row count from "10k", "1.5m" or "250"."""
+    value = value.strip().lower()
+    if value[-1:] in SIZE_SUFFIXES:
+        return int(float(value[:-1]) * SIZE_SUFFIXES[value[-1]])
+    return int(value)
+
+
+def bench_settings(db_path: Path, **overrides) -> Settings:
+    return Settings(bot_token="0:bench", bot_admin=0, db_path=db_path, **overrides)
+
+
+@contextmanager
+def scratch_db_path(name: str = "bench.db") -> Iterator[Path]:
+    with tempfile.TemporaryDirectory() as tmp:
+        yield Path(tmp) / name
@@ -1,10 +1,10 @@
 from functools import cache
 from pathlib import Path
 
-from pydantic import SecretStr
+from pydantic import SecretStr, model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
-from bot.enums import Stage
+from bot.enums import CheckpointMode, JournalMode, RunMode, Stage, SynchronousMode, UpdateDumpMode
 
 APP_NAME = "logbook"
 
@@ -28,10 +28,78 @@ class Settings(BaseSettings):
     db_path: Path = Path("data/logbook.db")
     sentry_dsn: str | None = None
 
+    bot_run_mode: RunMode = RunMode.POLLING
+    # Webhook mode: the bot serves plain HTTP, TLS is terminated by the reverse proxy in front of it
+    webhook_base_url: str | None = None  # public URL Telegram posts to, e.g. https://bot.example.com
+    webhook_path: str = "/webhook"
+    webhook_secret: SecretStr | None = None
+    webhook_host: str = "0.0.0.0"
+    webhook_port: int = 8080
+    webhook_max_concurrency: int = 32
+
+    # SQLite durability profile, applied to every connection
+    db_journal_mode: JournalMode = JournalMode.WAL
+    db_synchronous: SynchronousMode = SynchronousMode.NORMAL
+    db_mmap_size: int = 256 * 1024 * 1024  # bytes, 0 disables memory-mapped I/O
+    db_cache_size: int = -64000  # pages if positive, KiB if negative
+    db_busy_timeout: int = 5000  # ms
+    # WAL checkpoint policy: pages before a committing connection checkpoints itself (0 disables),
+    # and a background checkpoint every db_checkpoint_interval seconds (0 disables)
+    db_wal_autocheckpoint: int = 1000
+    db_checkpoint_interval: float = 300.0
+    db_checkpoint_mode: CheckpointMode = CheckpointMode.PASSIVE
+    db_slow_query_ms: float = 100.0  # queries taking longer are logged, 0 disables
+
+    # Outbound Bot API rate limits, calls per second (api_rate_limit=0 disables the limiter)
+    api_rate_limit: float = 30.0
+    api_chat_rate_limit: float = 1.0
+    api_chat_burst: int = 5
+    api_max_retries: int = 2  # after a 429, before the error reaches the handler
+
+    # Incoming updates written to logs/<app>_updates.log
+    update_dump_mode: UpdateDumpMode = UpdateDumpMode.FAILED
+    update_dump_sample_percent: float = 100.0  # share of updates dumped in sample mode
+    update_dump_max_chars: int = 4096
+
+    # Updates handled at once across all users, each user's updates are handled one at a time
+    update_max_concurrency: int = 64
+    collapse_navigation: bool = False  # drop a queued navigation tap when a newer one arrives
+    inline_debounce: float = 0.2  # seconds an inline query waits for the user to type on
+
+    # Answer callbacks and clear stale keyboards without waiting for them, drained on shutdown
+    background_side_calls: bool = False
+    background_drain_timeout: float = 10.0  # seconds
+
+    # Prometheus metrics served on http://<metrics_host>:<metrics_port>/metrics (port 0 disables)
+    metrics_host: str = "127.0.0.1"
+    metrics_port: int = 9464
+
+    user_cache_size: int = 10_000
+    user_cache_ttl: float = 3600.0  # seconds
+    fsm_idle_ttl: float = 900.0  # seconds before an idle FSM key is dropped from memory
+    search_cache_size: int = 10_000  # users whose inline search results are kept
+    search_cache_ttl: float = 300.0  # seconds
+
+    # /export and /import: files being written or read at once (others are turned away), and the
+    # bytes of one kept in memory before it is spooled to a temporary file
+    export_max_concurrency: int = 2
+    import_max_concurrency: int = 1
+    file_spool_size: int = 1024 * 1024
+
     @property
     def db_url(self) -> str:
         return f"sqlite+aiosqlite:///{self.db_path}"
 
+    @property
+    def webhook_url(self) -> str:
+        return f"{(self.webhook_base_url or '').rstrip('/')}{self.webhook_path}"
+
+    @model_validator(mode="after")
+    def _check_webhook(self) -> "Settings":
+        if self.bot_run_mode == RunMode.WEBHOOK and not self.webhook_base_url:
+            raise ValueError("WEBHOOK_BASE_URL is required when BOT_RUN_MODE=webhook")
+        return self
+
 
 @cache
 def get_settings() -> Settings:
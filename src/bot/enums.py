@@ -6,6 +6,17 @@ class Stage(StrEnum):
     DEV = auto()
 
 
+class RunMode(StrEnum):
+    POLLING = auto()
+    WEBHOOK = auto()
+
+
+class UpdateDumpMode(StrEnum):
+    OFF = auto()
+    SAMPLE = auto()  # a share of all updates, as they come in
+    FAILED = auto()  # updates no handler took or that raised
+
+
 class Category(StrEnum):
     BOOKS = auto()
     MOVIES = auto()
@@ -16,3 +27,37 @@ class Category(StrEnum):
 class ItemStatus(StrEnum):
     BACKLOG = auto()
     LOGGED = auto()
+
+
+class ExportFormat(StrEnum):
+    CSV = auto()
+    JSON = auto()
+    NDJSON = auto()  # one JSON object per line
+
+
+class DbAccess(StrEnum):
+    """Handler flag "db": what a handler needs from DbSessionMiddleware."""
+
+    NONE = auto()
+    READ = auto()
+    WRITE = auto()
+
+
+class JournalMode(StrEnum):
+    DELETE = auto()
+    TRUNCATE = auto()
+    WAL = auto()
+
+
+class SynchronousMode(StrEnum):
+    OFF = auto()
+    NORMAL = auto()
+    FULL = auto()
+    EXTRA = auto()
+
+
+class CheckpointMode(StrEnum):
+    PASSIVE = auto()
+    FULL = auto()
+    RESTART = auto()
+    TRUNCATE = auto()
@@ -1,10 +1,12 @@
 from aiogram import F, Router
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
+from aiogram.methods import AnswerCallbackQuery
 from aiogram.types import CallbackQuery, Message
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from bot.enums import Category, ItemStatus
+from bot.enums import Category, DbAccess, ItemStatus
+from bot.internal.background import BackgroundTasks
 from bot.internal.ui import clear_flow_state, render_main_window_from_callback, render_main_window_from_message
 from bot.keyboards.inline import (
     CATEGORY_EMOJI,
@@ -21,19 +23,20 @@ from bot.keyboards.inline import (
 )
 from database.crud.item import (
     MAX_TITLE_LENGTH,
-    PAGE_SIZE,
+    NewItem,
+    PageCursor,
     create_item,
+    create_items,
     delete_item,
     get_item,
-    get_items,
+    get_item_counts,
     get_items_count,
-    get_logged_years,
-    get_stats,
-    get_total_stats,
+    get_items_page,
+    get_title_keys,
     log_item,
     update_item_title,
 )
-from database.models import User
+from database.models import User, title_key
 
 router = Router()
 
@@ -48,7 +51,7 @@ class EditItem(StatesGroup):
 
 def _add_item_prompt_text(category: str, target_status: ItemStatus, error: str | None = None) -> str:
     action = "add backlog" if target_status == ItemStatus.BACKLOG else "add logged"
-    text = f"Category: {category}\nAction: {action}\nEnter title:"
+    text = f"Category: {category}\nAction: {action}\nEnter a title, or several one per line:"
     if error:
         text = f"{text}\n\n{error}"
     return text
@@ -61,82 +64,95 @@ def _edit_item_prompt_text(category: str, error: str | None = None) -> str:
     return text
 
 
-@router.callback_query(MenuCb.filter(F.action == "main"))
-async def main_menu(callback: CallbackQuery, state: FSMContext) -> None:
-    await callback.answer()
+@router.callback_query(MenuCb.filter(F.action == "main"), flags={"db": DbAccess.NONE})
+async def main_menu(callback: CallbackQuery, state: FSMContext, background_tasks: BackgroundTasks) -> None:
+    await background_tasks.side_call(callback.answer())
     await clear_flow_state(state)
-    await render_main_window_from_callback(callback, state, text="Choose a category:", reply_markup=main_menu_kb())
+    await render_main_window_from_callback(
+        callback, state, background_tasks, text="Choose a category:", reply_markup=main_menu_kb()
+    )
 
 
-@router.callback_query(MenuCb.filter(F.action == "category"))
+@router.callback_query(MenuCb.filter(F.action == "category"), flags={"db": DbAccess.READ})
 async def category_menu(
     callback: CallbackQuery,
     callback_data: MenuCb,
     user: User,
     session: AsyncSession,
     state: FSMContext,
+    background_tasks: BackgroundTasks,
 ) -> None:
-    await callback.answer()
+    await background_tasks.side_call(callback.answer())
     category = Category(callback_data.category)
-    backlog = await get_items_count(user.id, category, ItemStatus.BACKLOG, session)
-    logged = await get_items_count(user.id, category, ItemStatus.LOGGED, session)
+    counts = await get_item_counts(user.id, session)
     await render_main_window_from_callback(
         callback,
         state,
+        background_tasks,
         text=f"{category.value.capitalize()}:",
-        reply_markup=category_menu_kb(category.value, backlog, logged),
+        reply_markup=category_menu_kb(
+            category.value,
+            counts.count(category, ItemStatus.BACKLOG),
+            counts.count(category, ItemStatus.LOGGED),
+        ),
     )
 
 
-@router.callback_query(MenuCb.filter(F.action == "backlog"))
+@router.callback_query(MenuCb.filter(F.action == "backlog"), flags={"db": DbAccess.READ})
 async def backlog_list(
     callback: CallbackQuery,
     callback_data: MenuCb,
     user: User,
     session: AsyncSession,
     state: FSMContext,
+    background_tasks: BackgroundTasks,
 ) -> None:
-    await callback.answer()
+    await background_tasks.side_call(callback.answer())
     category = Category(callback_data.category)
-    page = callback_data.page
-    items = await get_items(user.id, category, ItemStatus.BACKLOG, session, page=page)
+    cursor = PageCursor.unpack(callback_data.cursor)
+    page = await get_items_page(user.id, category, ItemStatus.BACKLOG, session, cursor=cursor)
     total = await get_items_count(user.id, category, ItemStatus.BACKLOG, session)
 
-    text = f"Backlog ({total}):" if items else "Backlog is empty"
+    text = f"Backlog ({total}):" if page.items else "Backlog is empty"
     await render_main_window_from_callback(
         callback,
         state,
+        background_tasks,
         text=text,
-        reply_markup=items_list_kb(items, category.value, ItemStatus.BACKLOG, page, total, PAGE_SIZE),
+        reply_markup=items_list_kb(page, category.value, ItemStatus.BACKLOG),
     )
 
 
-@router.callback_query(MenuCb.filter(F.action == "logged"))
+@router.callback_query(MenuCb.filter(F.action == "logged"), flags={"db": DbAccess.READ})
 async def logged_list(
     callback: CallbackQuery,
     callback_data: MenuCb,
     user: User,
     session: AsyncSession,
     state: FSMContext,
+    background_tasks: BackgroundTasks,
 ) -> None:
-    await callback.answer()
+    await background_tasks.side_call(callback.answer())
     category = Category(callback_data.category)
-    page = callback_data.page
-    items = await get_items(user.id, category, ItemStatus.LOGGED, session, page=page)
+    cursor = PageCursor.unpack(callback_data.cursor)
+    page = await get_items_page(user.id, category, ItemStatus.LOGGED, session, cursor=cursor)
     total = await get_items_count(user.id, category, ItemStatus.LOGGED, session)
 
-    text = f"Logged ({total}):" if items else "Nothing logged yet"
+    text = f"Logged ({total}):" if page.items else "Nothing logged yet"
     await render_main_window_from_callback(
         callback,
         state,
+        background_tasks,
         text=text,
-        reply_markup=items_list_kb(items, category.value, ItemStatus.LOGGED, page, total, PAGE_SIZE),
+        reply_markup=items_list_kb(page, category.value, ItemStatus.LOGGED),
     )
 
 
-@router.callback_query(ItemCb.filter(F.action.in_({"add_backlog", "add_logged"})))
-async def add_item_start(callback: CallbackQuery, callback_data: ItemCb, state: FSMContext) -> None:
-    await callback.answer()
+@router.callback_query(ItemCb.filter(F.action.in_({"add_backlog", "add_logged"})), flags={"db": DbAccess.NONE})
+async def add_item_start(
+    callback: CallbackQuery, callback_data: ItemCb, state: FSMContext, background_tasks: BackgroundTasks
+) -> None:
+    await background_tasks.side_call(callback.answer())
     target_status = ItemStatus.BACKLOG if callback_data.action == "add_backlog" else ItemStatus.LOGGED
     await clear_flow_state(state)
     await state.set_state(AddItem.title)
@@ -147,101 +163,149 @@ async def add_item_start(callback: CallbackQuery, callback_data: ItemCb, state:
     await render_main_window_from_callback(
         callback,
         state,
+        background_tasks,
         text=_add_item_prompt_text(callback_data.category, target_status),
         reply_markup=cancel_kb(),
     )
 
 
+async def _add_items(
+    user_id: int, text: str, category: Category, status: ItemStatus, session: AsyncSession
+) -> list[str]:
+    """Add the title, or one per line of several; returns the summary lines.
+
+    A single title goes in as typed, cut to MAX_TITLE_LENGTH, like it always has. Of several lines,
+    those that fit and aren't in the category yet go in with one INSERT.
+    """
+    status_name = "backlog" if status == ItemStatus.BACKLOG else "logged"
+    titles = [" ".join(line.split()) for line in text.splitlines() if line.strip()]
+    if len(titles) == 1:
+        await create_item(user_id, text[:MAX_TITLE_LENGTH], category, session, status=status)
+        return [f"Added to {status_name}!"]
+
+    fitting = [title for title in titles if len(title) <= MAX_TITLE_LENGTH]
+    # The first of the lines with the same key
+    by_key: dict[str, str] = {}
+    for title in fitting:
+        by_key.setdefault(title_key(title), title)
+    existing = await get_title_keys(user_id, category, by_key.keys(), session)
+    new_items = [NewItem(title, category, status) for key, title in by_key.items() if key not in existing]
+    added = await create_items(user_id, new_items, session)
+
+    lines = [f"Added {added} to {status_name}!" if added else "Nothing new to add."]
+    if duplicates := len(fitting) - added:
+        lines.append(f"Skipped {duplicates} already in {category.value}.")
+    if too_long := len(titles) - len(fitting):
+        lines.append(f"Skipped {too_long} over {MAX_TITLE_LENGTH} characters.")
+    return lines
+
+
 @router.message(AddItem.title)
-async def add_item_title(message: Message, state: FSMContext, user: User, session: AsyncSession) -> None:
+async def add_item_title(
+    message: Message, state: FSMContext, background_tasks: BackgroundTasks, user: User, session: AsyncSession
+) -> None:
     data = await state.get_data()
     category = Category(data["category"])
     target_status = ItemStatus(data["target_status"])
 
-    title = (message.text or "").strip()[:MAX_TITLE_LENGTH]
-    if not title:
+    text = (message.text or "").strip()
+    if not text:
         await render_main_window_from_message(
             message,
             state,
+            background_tasks,
             text=_add_item_prompt_text(category.value, target_status, error="Title cannot be empty. Try again:"),
             reply_markup=cancel_kb(),
         )
         return
 
-    await create_item(user.id, title, category, session, status=target_status)
-    backlog = await get_items_count(user.id, category, ItemStatus.BACKLOG, session)
-    logged = await get_items_count(user.id, category, ItemStatus.LOGGED, session)
+    summary = await _add_items(user.id, text, category, target_status, session)
+    counts = await get_item_counts(user.id, session)
 
     await render_main_window_from_message(
         message,
         state,
-        text=f"Added to {'backlog' if target_status == ItemStatus.BACKLOG else 'logged'}!\n\n"
-        f"{category.value.capitalize()}:",
-        reply_markup=category_menu_kb(category.value, backlog, logged),
+        background_tasks,
+        text="\n".join(summary) + f"\n\n{category.value.capitalize()}:",
+        reply_markup=category_menu_kb(
+            category.value,
+            counts.count(category, ItemStatus.BACKLOG),
+            counts.count(category, ItemStatus.LOGGED),
+        ),
     )
     await clear_flow_state(state)
 
 
-@router.callback_query(ItemCb.filter(F.action == "view"))
-async def view_item(callback: CallbackQuery, callback_data: ItemCb, session: AsyncSession, state: FSMContext) -> None:
+@router.callback_query(ItemCb.filter(F.action == "view"), flags={"db": DbAccess.READ})
+async def view_item(
+    callback: CallbackQuery,
+    callback_data: ItemCb,
+    session: AsyncSession,
+    state: FSMContext,
+    background_tasks: BackgroundTasks,
+) -> AnswerCallbackQuery | None:
     item = await get_item(callback_data.id, session)
     if not item:
-        await callback.answer("Item not found")
-        return
+        return callback.answer("Item not found")
 
-    await callback.answer()
+    await background_tasks.side_call(callback.answer())
     date_str = item.created_at.strftime("%Y-%m-%d")
     await render_main_window_from_callback(
         callback,
         state,
+        background_tasks,
         text=f"<b>{item.title}</b>\n{date_str}",
-        reply_markup=item_detail_kb(item.id, item.category.value, item.status, callback_data.page),
+        reply_markup=item_detail_kb(item.id, item.category.value, item.status, callback_data.cursor),
     )
 
 
-@router.callback_query(ItemCb.filter(F.action == "edit"))
+@router.callback_query(ItemCb.filter(F.action == "edit"), flags={"db": DbAccess.READ})
 async def edit_item_start(
     callback: CallbackQuery,
     callback_data: ItemCb,
     state: FSMContext,
+    background_tasks: BackgroundTasks,
     session: AsyncSession,
-) -> None:
+) -> AnswerCallbackQuery | None:
     category = callback_data.category
     if category is None:
         item = await get_item(callback_data.id, session)
         if not item:
-            await callback.answer("Item not found")
-            return
+            return callback.answer("Item not found")
         category = item.category.value
 
-    await callback.answer()
+    await background_tasks.side_call(callback.answer())
     await clear_flow_state(state)
     await state.set_state(EditItem.title)
     await state.update_data(
         item_id=callback_data.id,
         category=category,
-        page=callback_data.page,
+        cursor=callback_data.cursor,
     )
     await render_main_window_from_callback(
         callback,
         state,
+        background_tasks,
         text=_edit_item_prompt_text(category),
         reply_markup=cancel_edit_kb(callback_data.id),
     )
 
 
 @router.message(EditItem.title)
-async def edit_item_title(message: Message, state: FSMContext, session: AsyncSession) -> None:
+async def edit_item_title(
+    message: Message, state: FSMContext, background_tasks: BackgroundTasks, session: AsyncSession
+) -> None:
     data = await state.get_data()
     item_id = data["item_id"]
     category = data["category"]
-    page = data["page"]
+    cursor = data["cursor"]
 
     title = (message.text or "").strip()[:MAX_TITLE_LENGTH]
     if not title:
         await render_main_window_from_message(
             message,
             state,
+            background_tasks,
             text=_edit_item_prompt_text(category, error="Title cannot be empty. Try again:"),
             reply_markup=cancel_edit_kb(item_id),
         )
@@ -249,7 +313,9 @@ async def edit_item_title(message: Message, state: FSMContext, session: AsyncSes
 
     item = await update_item_title(item_id, title, session)
     if not item:
-        await render_main_window_from_message(message, state, text="Item not found", reply_markup=main_menu_kb())
+        await render_main_window_from_message(
+            message, state, background_tasks, text="Item not found", reply_markup=main_menu_kb()
+        )
         await clear_flow_state(state)
         return
 
@@ -257,8 +323,9 @@ async def edit_item_title(message: Message, state: FSMContext, session: AsyncSes
     await render_main_window_from_message(
         message,
         state,
+        background_tasks,
         text=f"Updated!\n\n<b>{item.title}</b>\n{date_str}",
-        reply_markup=item_detail_kb(item.id, item.category.value, item.status, page),
+        reply_markup=item_detail_kb(item.id, item.category.value, item.status, cursor),
     )
     await clear_flow_state(state)
 
@@ -270,23 +337,24 @@ async def log_item_cb(
     user: User,
     session: AsyncSession,
     state: FSMContext,
-) -> None:
+    background_tasks: BackgroundTasks,
+) -> AnswerCallbackQuery | None:
     item = await log_item(callback_data.id, session)
     if not item:
-        await callback.answer("Item not found")
-        return
+        return callback.answer("Item not found")
 
-    await callback.answer("Logged!")
-    page = callback_data.page
-    items = await get_items(user.id, item.category, ItemStatus.BACKLOG, session, page=page)
+    await background_tasks.side_call(callback.answer("Logged!"))
+    cursor = PageCursor.unpack(callback_data.cursor)
+    page = await get_items_page(user.id, item.category, ItemStatus.BACKLOG, session, cursor=cursor)
     total = await get_items_count(user.id, item.category, ItemStatus.BACKLOG, session)
 
-    text = f"Backlog ({total}):" if items else "Backlog is empty"
+    text = f"Backlog ({total}):" if page.items else "Backlog is empty"
     await render_main_window_from_callback(
         callback,
         state,
+        background_tasks,
         text=text,
-        reply_markup=items_list_kb(items, item.category.value, ItemStatus.BACKLOG, page, total, PAGE_SIZE),
+        reply_markup=items_list_kb(page, item.category.value, ItemStatus.BACKLOG),
     )
 
 
@@ -297,58 +365,70 @@ async def delete_item_cb(
     user: User,
     session: AsyncSession,
     state: FSMContext,
-) -> None:
+    background_tasks: BackgroundTasks,
+) -> AnswerCallbackQuery | None:
     item = await get_item(callback_data.id, session)
     if not item:
-        await callback.answer("Item not found")
-        return
+        return callback.answer("Item not found")
 
     category = item.category
     status = item.status
     await delete_item(callback_data.id, session)
 
-    await callback.answer("Deleted!")
-    page = callback_data.page
-    items = await get_items(user.id, category, status, session, page=page)
+    await background_tasks.side_call(callback.answer("Deleted!"))
+    cursor = PageCursor.unpack(callback_data.cursor)
+    page = await get_items_page(user.id, category, status, session, cursor=cursor)
     total = await get_items_count(user.id, category, status, session)
 
-    text = f"{status.value.capitalize()} ({total}):" if items else f"{status.value.capitalize()} is empty"
+    text = f"{status.value.capitalize()} ({total}):" if page.items else f"{status.value.capitalize()} is empty"
     await render_main_window_from_callback(
         callback,
         state,
+        background_tasks,
         text=text,
-        reply_markup=items_list_kb(items, category.value, status, page, total, PAGE_SIZE),
+        reply_markup=items_list_kb(page, category.value, status),
     )
 
 
 # Stats handlers
-@router.callback_query(MenuCb.filter(F.action == "stats"))
-async def stats_menu(callback: CallbackQuery, user: User, session: AsyncSession, state: FSMContext) -> None:
-    await callback.answer()
-    totals = await get_total_stats(user.id, session)
-    years = await get_logged_years(user.id, session)
+@router.callback_query(MenuCb.filter(F.action == "stats"), flags={"db": DbAccess.READ})
+async def stats_menu(
+    callback: CallbackQuery, user: User, session: AsyncSession, state: FSMContext, background_tasks: BackgroundTasks
+) -> None:
+    await background_tasks.side_call(callback.answer())
+    counts = await get_item_counts(user.id, session)
+    years = counts.years(ItemStatus.LOGGED)
 
-    text = f"<b>Your stats</b>\n\nBacklog: {totals['backlog']}\nLogged: {totals['logged']}"
+    text = (
+        f"<b>Your stats</b>\n\nBacklog: {counts.count(status=ItemStatus.BACKLOG)}\n"
+        f"Logged: {counts.count(status=ItemStatus.LOGGED)}"
+    )
     await clear_flow_state(state)
 
     if years:
-        await render_main_window_from_callback(callback, state, text=text, reply_markup=stats_kb(years))
+        await render_main_window_from_callback(
+            callback, state, background_tasks, text=text, reply_markup=stats_kb(years)
+        )
     else:
         text += "\n\n<i>No logged items yet to show yearly stats.</i>"
-        await render_main_window_from_callback(callback, state, text=text, reply_markup=main_menu_kb())
+        await render_main_window_from_callback(
+            callback, state, background_tasks, text=text, reply_markup=main_menu_kb()
+        )
 
 
-@router.callback_query(MenuCb.filter(F.action == "stats_year"))
+@router.callback_query(MenuCb.filter(F.action == "stats_year"), flags={"db": DbAccess.READ})
 async def stats_year(
     callback: CallbackQuery,
     callback_data: MenuCb,
     user: User,
     session: AsyncSession,
     state: FSMContext,
+    background_tasks: BackgroundTasks,
 ) -> None:
-    await callback.answer()
+    await background_tasks.side_call(callback.answer())
     year = callback_data.year
-    stats = await get_stats(user.id, session, year=year)
+    counts = await get_item_counts(user.id, session)
+    stats = counts.by_category(ItemStatus.LOGGED, year)
 
     lines = [f"<b>Logged in {year}</b>\n"]
     total = 0
@@ -357,4 +437,6 @@ async def stats_year(
         total += count
     lines.append(f"\nTotal: {total}")
 
-    await render_main_window_from_callback(callback, state, text="\n".join(lines), reply_markup=stats_year_kb(year))
+    await render_main_window_from_callback(
+        callback, state, background_tasks, text="\n".join(lines), reply_markup=stats_year_kb(year)
+    )
@@ -0,0 +1,63 @@
+import tempfile
+from contextlib import aclosing
+from datetime import date
+
+from aiogram import Router
+from aiogram.enums import ChatAction
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.enums import DbAccess
+from bot.internal.background import BackgroundTasks
+from bot.internal.export import MAX_EXPORT_BYTES, ExportOptions, FileJobs, SpooledInputFile, write_export
+from database.crud.item import stream_items
+from database.models import User
+
+router = Router()
+
+EXPORT_USAGE = (
+    "<b>Export your items</b>\n\n"
+    "/export [csv | json | ndjson] [category] [backlog | logged] [year]\n\n"
+    "Everything as CSV by default, e.g. <code>/export json books logged 2024</code>"
+)
+
+
+@router.message(Command("export"), flags={"db": DbAccess.READ})
+async def export_cmd(
+    message: Message,
+    command: CommandObject,
+    user: User,
+    session: AsyncSession,
+    background_tasks: BackgroundTasks,
+    exports: FileJobs,
+) -> None:
+    """Send the user's items as a file, leaving the main window and any flow in progress as they are."""
+    options = ExportOptions.parse(command.args)
+    if options is None:
+        await message.answer(EXPORT_USAGE)
+        return
+    if not exports.acquire():
+        await message.answer("Too many exports are running right now, try again in a minute.")
+        return
+
+    try:
+        await background_tasks.side_call(message.bot.send_chat_action(message.chat.id, ChatAction.UPLOAD_DOCUMENT))
+        with tempfile.SpooledTemporaryFile(max_size=exports.spool_size) as file:
+            batches = stream_items(
+                user.id, session, category=options.category, status=options.status, year=options.year
+            )
+            async with aclosing(batches):
+                written = await write_export(batches, options.format, file)
+            if not written:
+                await message.answer("Nothing to export for these filters.")
+            elif file.tell() > MAX_EXPORT_BYTES:
+                await message.answer(
+                    f"The export is over {MAX_EXPORT_BYTES // (1024 * 1024)} MB, more than a bot can send. "
+                    "Narrow it down by category, status or year."
+                )
+            else:
+                document = SpooledInputFile(file, options.filename(date.today()))
+                await message.answer_document(document, caption=f"{written:,} items")
+    finally:
+        exports.release()
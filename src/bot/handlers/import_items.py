@@ -0,0 +1,192 @@
+import html
+import tempfile
+from pathlib import PurePath
+
+from aiogram import F, Router
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.filters import Command, CommandObject
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.types import Document, Message
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from bot.enums import Category, DbAccess, ItemStatus
+from bot.internal.background import BackgroundTasks
+from bot.internal.export import FileJobs
+from bot.internal.item_import import (
+    IMPORT_SUFFIXES,
+    MAX_IMPORT_BYTES,
+    ImportOptions,
+    ImportReport,
+    import_items,
+    read_items,
+)
+from bot.internal.ui import clear_flow_state, render_main_window_from_message
+from bot.keyboards.inline import cancel_kb, main_menu_kb
+from database.crud.item import MAX_TITLE_LENGTH
+from database.models import User
+
+router = Router()
+
+IMPORT_USAGE = (
+    "<b>Import items</b>\n\n"
+    "/import [category] [backlog | logged]\n\n"
+    "The category and status are for items whose file doesn't say, e.g. <code>/import movies logged</code>"
+)
+
+
+class ImportItems(StatesGroup):
+    file = State()
+
+
+def _prompt_text(options: ImportOptions, error: str | None = None) -> str:
+    category = options.category.value if options.category else "from the file"
+    status = (options.status or ItemStatus.BACKLOG).value
+    text = (
+        "<b>Import items</b>\n\n"
+        f"Send a CSV, TXT, JSON or NDJSON file up to {MAX_IMPORT_BYTES // (1024 * 1024)} MB. Goodreads and "
+        "Letterboxd exports and /export files work as they are, TXT files have one title per line.\n\n"
+        f"Category: {category}\nStatus: {status}, unless the file says"
+    )
+    if error:
+        text = f"{text}\n\n{error}"
+    return text
+
+
+def _report_text(filename: str, report: ImportReport, done: bool) -> str:
+    if report.failed:
+        header = f"Import of {html.escape(filename)} stopped"
+    else:
+        header = f"{'Imported' if done else 'Importing'} {html.escape(filename)}"
+    lines = [f"<b>{header}</b>\n", f"Added: {report.added:,}"]
+    if report.duplicates:
+        lines.append(f"Already there: {report.duplicates:,}")
+    if report.invalid:
+        lines.append(f"Skipped without a title or category: {report.invalid:,}")
+    if report.shortened:
+        lines.append(f"Titles cut to {MAX_TITLE_LENGTH} characters: {report.shortened:,}")
+    if report.failed:
+        lines.append("\nSomething went wrong. The items added are kept, send the file again for the rest.")
+    elif done and report.error:
+        lines.append(f"\nStopped reading at {html.escape(report.error)}")
+    return "\n".join(lines)
+
+
+def _options(data: dict) -> ImportOptions:
+    category, status = data.get("category"), data.get("status")
+    return ImportOptions(Category(category) if category else None, ItemStatus(status) if status else None)
+
+
+@router.message(Command("import"), flags={"db": DbAccess.NONE})
+async def import_cmd(
+    message: Message, command: CommandObject, state: FSMContext, background_tasks: BackgroundTasks
+) -> None:
+    options = ImportOptions.parse(command.args)
+    if options is None:
+        await message.answer(IMPORT_USAGE)
+        return
+
+    await clear_flow_state(state)
+    await state.set_state(ImportItems.file)
+    await state.update_data(
+        category=options.category.value if options.category else None,
+        status=options.status.value if options.status else None,
+    )
+    await render_main_window_from_message(
+        message, state, background_tasks, text=_prompt_text(options), reply_markup=cancel_kb()
+    )
+
+
+async def _show_report(report_message: Message, text: str, done: bool) -> None:
+    """Edit the report into its message; the final one is sent anew if the user deleted that message."""
+    try:
+        await report_message.edit_text(text)
+    except TelegramBadRequest as exc:
+        if done and "message is not modified" not in str(exc).lower():
+            await report_message.answer(text)
+
+
+async def _import_file(
+    report_message: Message,
+    user_id: int,
+    document: Document,
+    options: ImportOptions,
+    session_factory: async_sessionmaker[AsyncSession],
+    imports: FileJobs,
+) -> None:
+    """Download and import the file, reporting progress in report_message and the outcome in any case."""
+    filename = document.file_name or "file"
+    report = ImportReport()
+
+    async def _progress(report: ImportReport) -> None:
+        await _show_report(report_message, _report_text(filename, report, done=False), done=False)
+
+    try:
+        with tempfile.SpooledTemporaryFile(max_size=imports.spool_size) as file:
+            await report_message.bot.download(document, destination=file)
+            items = read_items(file, filename, options, report)
+            await import_items(user_id, items, session_factory, report, _progress)
+    except BaseException:
+        # Cancelled too, when the bot stops before the import is done
+        report.failed = True
+        raise
+    finally:
+        imports.release()
+        await _show_report(report_message, _report_text(filename, report, done=True), done=True)
+
+
+@router.message(ImportItems.file, F.document, flags={"db": DbAccess.NONE})
+async def import_file(
+    message: Message,
+    state: FSMContext,
+    background_tasks: BackgroundTasks,
+    user: User,
+    session_factory: async_sessionmaker[AsyncSession],
+    imports: FileJobs,
+) -> None:
+    """Start importing the file in the background and return the user to the main menu.
+
+    The import runs outside of this update, so it holds neither the user's place in
+    UserQueueMiddleware nor one of its handler slots: the user can go on while it runs.
+    """
+    options = _options(await state.get_data())
+    document = message.document
+    filename = document.file_name or "file"
+    error = None
+    if PurePath(filename).suffix.lower() not in IMPORT_SUFFIXES:
+        error = "That is not a CSV, TXT, JSON or NDJSON file."
+    elif (document.file_size or 0) > MAX_IMPORT_BYTES:
+        error = "The file is too large for a bot to download."
+    elif not imports.acquire():
+        error = "Too many imports are running right now, try again in a minute."
+    if error:
+        await render_main_window_from_message(
+            message, state, background_tasks, text=_prompt_text(options, error=error), reply_markup=cancel_kb()
+        )
+        return
+
+    try:
+        report_message = await message.answer(_report_text(filename, ImportReport(), done=False))
+    except BaseException:
+        imports.release()
+        raise
+    background_tasks.spawn(
+        _import_file(report_message, user.id, document, options, session_factory, imports),
+        name=f"import for user {user.id}",
+    )
+    await clear_flow_state(state)
+    await render_main_window_from_message(
+        message, state, background_tasks, text="Choose a category:", reply_markup=main_menu_kb()
+    )
+
+
+@router.message(ImportItems.file, flags={"db": DbAccess.NONE})
+async def import_not_a_file(message: Message, state: FSMContext, background_tasks: BackgroundTasks) -> None:
+    options = _options(await state.get_data())
+    await render_main_window_from_message(
+        message,
+        state,
+        background_tasks,
+        text=_prompt_text(options, error="Send the items as a file."),
+        reply_markup=cancel_kb(),
+    )
@@ -0,0 +1,55 @@
+import html
+
+from aiogram import Router
+from aiogram.methods import AnswerInlineQuery
+from aiogram.types import InlineQuery, InlineQueryResultArticle, InputTextMessageContent
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.enums import DbAccess, ItemStatus
+from bot.internal.search_cache import FoundItem, SearchCache
+from bot.keyboards.inline import CATEGORY_EMOJI
+from database.crud.item import MAX_SEARCH_TERMS, search_items, search_terms
+
+router = Router()
+
+
+def _article(item: FoundItem) -> InlineQueryResultArticle:
+    emoji = CATEGORY_EMOJI[item.category]
+    logged = "\u2705 " if item.status == ItemStatus.LOGGED else ""
+    return InlineQueryResultArticle(
+        id=str(item.id),
+        title=f"{emoji} {logged}{item.title}",
+        description=f"{item.category.value.capitalize()}, {item.status.value}, added {item.created_at:%Y-%m-%d}",
+        input_message_content=InputTextMessageContent(message_text=f"{emoji} <b>{html.escape(item.title)}</b>"),
+    )
+
+
+def _cache_key(query: str) -> str:
+    # Queries differing in case share results. casefold() folds a few letters further than the
+    # items_fts tokenizer does, "ß" to "ss", and those queries are kept apart as typed
+    folded = query.casefold()
+    return folded if folded == query.lower() else query
+
+
+@router.inline_query(flags={"db": DbAccess.READ})
+async def inline_lookup(
+    inline_query: InlineQuery, session: AsyncSession, search_cache: SearchCache
+) -> AnswerInlineQuery:
+    """Items of the user whose title words start with the query, e.g. "@bot dune mes".
+
+    Runs on every keystroke that outlasts the debounce (see UserQueueMiddleware): results come from
+    search_cache when they can, and the lookup never registers the user or opens a transaction.
+    """
+    user_id = inline_query.from_user.id
+    query = " ".join(search_terms(inline_query.query)[:MAX_SEARCH_TERMS])
+    if not query:
+        return inline_query.answer([], cache_time=0, is_personal=True)
+
+    key = _cache_key(query)
+    items = search_cache.get(user_id, key)
+    if items is None:
+        generation = search_cache.generation(user_id)
+        items = [FoundItem.of(item) for item in await search_items(user_id, query, session)]
+        search_cache.put(user_id, key, items, generation)
+    # Not cached by Telegram: search_cache is dropped on every change to the items, Telegram's is not
+    return inline_query.answer([_article(item) for item in items], cache_time=0, is_personal=True)
@@ -0,0 +1,92 @@
+import html
+
+from aiogram import F, Router
+from aiogram.filters import Command, CommandObject
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.types import CallbackQuery, Message
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.enums import DbAccess
+from bot.internal.background import BackgroundTasks
+from bot.internal.ui import clear_flow_state, render_main_window_from_callback, render_main_window_from_message
+from bot.keyboards.inline import MenuCb, cancel_kb, search_results_kb
+from database.crud.item import SEARCH_LIMIT, search_items
+from database.models import User
+
+router = Router()
+
+SEARCH_PROMPT = "Search your items across all categories.\nEnter a title or the start of its words:"
+
+
+class SearchItems(StatesGroup):
+    query = State()
+
+
+async def _show_results(
+    message: Message,
+    state: FSMContext,
+    background_tasks: BackgroundTasks,
+    user: User,
+    session: AsyncSession,
+    query: str,
+) -> None:
+    items = await search_items(user.id, query, session)
+    quoted = html.escape(query)
+    if not items:
+        text = f"Nothing found for <b>{quoted}</b>"
+    elif len(items) == SEARCH_LIMIT:
+        text = f"First {SEARCH_LIMIT} matches for <b>{quoted}</b>, add a word to narrow them down:"
+    else:
+        text = f"Found {len(items)} for <b>{quoted}</b>:"
+    await clear_flow_state(state)
+    await render_main_window_from_message(
+        message, state, background_tasks, text=text, reply_markup=search_results_kb(items)
+    )
+
+
+@router.message(Command("search"), flags={"db": DbAccess.READ})
+async def search_cmd(
+    message: Message,
+    command: CommandObject,
+    user: User,
+    session: AsyncSession,
+    state: FSMContext,
+    background_tasks: BackgroundTasks,
+) -> None:
+    if command.args:
+        await _show_results(message, state, background_tasks, user, session, command.args.strip())
+        return
+
+    await clear_flow_state(state)
+    await state.set_state(SearchItems.query)
+    await render_main_window_from_message(
+        message, state, background_tasks, text=SEARCH_PROMPT, reply_markup=cancel_kb()
+    )
+
+
+@router.callback_query(MenuCb.filter(F.action == "search"), flags={"db": DbAccess.NONE})
+async def search_start(callback: CallbackQuery, state: FSMContext, background_tasks: BackgroundTasks) -> None:
+    await background_tasks.side_call(callback.answer())
+    await clear_flow_state(state)
+    await state.set_state(SearchItems.query)
+    await render_main_window_from_callback(
+        callback, state, background_tasks, text=SEARCH_PROMPT, reply_markup=cancel_kb()
+    )
+
+
+@router.message(SearchItems.query, flags={"db": DbAccess.READ})
+async def search_query_entered(
+    message: Message, user: User, session: AsyncSession, state: FSMContext, background_tasks: BackgroundTasks
+) -> None:
+    query = (message.text or "").strip()
+    if not query:
+        await render_main_window_from_message(
+            message,
+            state,
+            background_tasks,
+            text=f"{SEARCH_PROMPT}\n\nSend the search as text.",
+            reply_markup=cancel_kb(),
+        )
+        return
+    await _show_results(message, state, background_tasks, user, session, query)
@@ -4,35 +4,45 @@ from aiogram.fsm.context import FSMContext
 from aiogram.types import Message
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from bot.enums import DbAccess, ItemStatus
+from bot.internal.background import BackgroundTasks
 from bot.internal.ui import clear_flow_state, render_main_window_from_message
 from bot.keyboards.inline import main_menu_kb, stats_kb
-from database.crud.item import get_logged_years, get_total_stats
+from database.crud.item import get_item_counts
 from database.models import User
 
 router = Router()
 
 
-@router.message(CommandStart())
-async def start_cmd(message: Message, user: User, state: FSMContext) -> None:
+@router.message(CommandStart(), flags={"db": DbAccess.READ})
+async def start_cmd(message: Message, user: User, state: FSMContext, background_tasks: BackgroundTasks) -> None:
     await clear_flow_state(state)
     await render_main_window_from_message(
         message,
         state,
+        background_tasks,
         text=f"Hi, {user.fullname}!\nChoose a category:",
         reply_markup=main_menu_kb(),
     )
 
 
-@router.message(Command("stats"))
-async def stats_cmd(message: Message, user: User, session: AsyncSession, state: FSMContext) -> None:
-    totals = await get_total_stats(user.id, session)
-    years = await get_logged_years(user.id, session)
+@router.message(Command("stats"), flags={"db": DbAccess.READ})
+async def stats_cmd(
+    message: Message, user: User, session: AsyncSession, state: FSMContext, background_tasks: BackgroundTasks
+) -> None:
+    counts = await get_item_counts(user.id, session)
+    years = counts.years(ItemStatus.LOGGED)
 
-    text = f"<b>Your stats</b>\n\nBacklog: {totals['backlog']}\nLogged: {totals['logged']}"
+    text = (
+        f"<b>Your stats</b>\n\nBacklog: {counts.count(status=ItemStatus.BACKLOG)}\n"
+        f"Logged: {counts.count(status=ItemStatus.LOGGED)}"
+    )
     await clear_flow_state(state)
 
     if years:
-        await render_main_window_from_message(message, state, text=text, reply_markup=stats_kb(years))
+        await render_main_window_from_message(
+            message, state, background_tasks, text=text, reply_markup=stats_kb(years)
+        )
     else:
         text += "\n\n<i>No logged items yet to show yearly stats.</i>"
-        await render_main_window_from_message(message, state, text=text, reply_markup=main_menu_kb())
+        await render_main_window_from_message(message, state, background_tasks, text=text, reply_markup=main_menu_kb())
@@ -0,0 +1,64 @@
+import asyncio
+import logging
+from collections.abc import Awaitable
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundTasks:
+    """Fire-and-forget side calls that are kept referenced, logged when they fail, and drained on shutdown.
+
+    Disabled by default: side_call() then simply awaits, like a direct call would. build_app() makes
+    one per bot and hands it to handlers as background_tasks.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._tasks: set[asyncio.Task] = set()
+        self.started = 0
+        self.failed = 0
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    async def side_call(self, aw: Awaitable[Any]) -> None:
+        """Run a call nothing waits on the result of, such as answering a callback query.
+
+        When enabled it runs concurrently with the rest of the handler, otherwise it is awaited in place.
+        """
+        if self.enabled:
+            self.spawn(aw, name=getattr(aw, "__qualname__", type(aw).__name__))
+        else:
+            await aw
+
+    def spawn(self, aw: Awaitable[Any], name: str | None = None) -> asyncio.Task:
+        task = asyncio.create_task(_await(aw), name=name)
+        self._tasks.add(task)
+        task.add_done_callback(self._done)
+        self.started += 1
+        return task
+
+    def _done(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        if task.cancelled():
+            return
+        if exc := task.exception():
+            self.failed += 1
+            logger.warning("Background call %s failed", task.get_name(), exc_info=exc)
+
+    async def drain(self, timeout: float = 10.0) -> None:
+        """Wait for pending tasks, cancelling whatever is still running after timeout seconds."""
+        if not self._tasks:
+            return
+        _, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.wait(pending)
+            logger.warning("Cancelled %d background calls still running at shutdown", len(pending))
+
+
+async def _await(aw: Awaitable[Any]) -> Any:
+    # create_task() only takes coroutines, bot methods are merely awaitable
+    return await aw
@@ -0,0 +1,136 @@
+import codecs
+import csv
+import io
+import json
+from collections.abc import AsyncGenerator, AsyncIterable, Sequence
+from dataclasses import dataclass
+from datetime import date
+from typing import IO, Any
+
+from aiogram import Bot
+from aiogram.types import InputFile
+from aiogram.types.input_file import DEFAULT_CHUNK_SIZE
+from sqlalchemy import Row
+
+from bot.config import APP_NAME
+from bot.enums import Category, ExportFormat, ItemStatus
+
+EXPORT_FIELDS = ("id", "title", "category", "status", "created_at")
+# Largest file a bot can send
+MAX_EXPORT_BYTES = 50 * 1024 * 1024
+
+
+@dataclass(frozen=True, slots=True)
+class ExportOptions:
+    format: ExportFormat = ExportFormat.CSV
+    category: Category | None = None
+    status: ItemStatus | None = None
+    year: int | None = None
+
+    @classmethod
+    def parse(cls, args: str | None) -> "ExportOptions | None":
+        """Options from /export arguments in any order, e.g. "json books 2024"; None if one isn't known."""
+        options: dict[str, Any] = {}
+        for arg in (args or "").lower().split():
+            if arg in ExportFormat:
+                options["format"] = ExportFormat(arg)
+            elif arg in Category:
+                options["category"] = Category(arg)
+            elif arg in ItemStatus:
+                options["status"] = ItemStatus(arg)
+            elif arg.isdigit() and len(arg) == 4:
+                options["year"] = int(arg)
+            else:
+                return None
+        return cls(**options)
+
+    def filename(self, today: date) -> str:
+        filters = [str(value) for value in (self.category, self.status, self.year) if value is not None]
+        return f"{'_'.join([APP_NAME, *filters, today.isoformat()])}.{self.format}"
+
+
+class FileJobs:
+    """Exports or imports of item files running at once.
+
+    Capped so they don't take the database and the event loop from everyone else: a job over the cap
+    is turned away rather than queued, as it would hold the user's place in UserQueueMiddleware.
+    build_app() makes one for exports and one for imports and hands them to the handlers.
+    """
+
+    def __init__(self, max_concurrency: int = 2, spool_size: int = 1024 * 1024):
+        self.max_concurrency = max_concurrency
+        # Bytes of a file kept in memory before it is spooled to a temporary file
+        self.spool_size = spool_size
+        self.running = 0
+        self.started = 0
+        self.rejected = 0
+
+    def acquire(self) -> bool:
+        """Take a slot if one is free; every successful acquire() must be followed by release()."""
+        if self.running >= self.max_concurrency:
+            self.rejected += 1
+            return False
+        self.running += 1
+        self.started += 1
+        return True
+
+    def release(self) -> None:
+        self.running -= 1
+
+
+class SpooledInputFile(InputFile):
+    """Upload of an open binary file, read from the start every time: a call retried after a 429 sends it again."""
+
+    def __init__(self, file: IO[bytes], filename: str, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        super().__init__(filename=filename, chunk_size=chunk_size)
+        self.file = file
+
+    async def read(self, bot: Bot) -> AsyncGenerator[bytes]:
+        self.file.seek(0)
+        while chunk := self.file.read(self.chunk_size):
+            yield chunk
+
+
+def _values(row: Row) -> tuple[Any, ...]:
+    item_id, title, category, status, created_at = row
+    return item_id, title, category.value, status.value, created_at.isoformat(sep=" ")
+
+
+def _encode(rows: Sequence[Row], export_format: ExportFormat, first: bool) -> bytes:
+    values = map(_values, rows)
+    if export_format == ExportFormat.CSV:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(values)
+        return buffer.getvalue().encode()
+    lines = [json.dumps(dict(zip(EXPORT_FIELDS, record, strict=True)), ensure_ascii=False) for record in values]
+    if export_format == ExportFormat.NDJSON:
+        return "".join(f"{line}\n" for line in lines).encode()
+    # The elements of one JSON array, continuing the previous batch's
+    return (("\n" if first else ",\n") + ",\n".join(lines)).encode()
+
+
+async def write_export(
+    batches: AsyncIterable[Sequence[Row]],
+    export_format: ExportFormat,
+    file: IO[bytes],
+    max_bytes: int = MAX_EXPORT_BYTES,
+) -> int:
+    """Write item rows (see stream_items) to file one batch at a time, returns the number written.
+
+    Stops reading once the file is over max_bytes: check file.tell() to tell a partial export.
+    """
+    written = 0
+    if export_format == ExportFormat.CSV:
+        # With the BOM spreadsheets read the file as UTF-8 rather than the system code page
+        file.write(codecs.BOM_UTF8 + ",".join(EXPORT_FIELDS).encode() + b"\r\n")
+    elif export_format == ExportFormat.JSON:
+        file.write(b"[")
+    async for rows in batches:
+        if rows:
+            file.write(_encode(rows, export_format, first=not written))
+            written += len(rows)
+        if file.tell() > max_bytes:
+            break
+    if export_format == ExportFormat.JSON:
+        file.write(b"\n]\n" if written else b"]\n")
+    return written
@@ -0,0 +1,155 @@
+import logging
+import time
+from collections.abc import Mapping
+from typing import Any
+
+from aiogram.exceptions import DataNotDictLikeError
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from bot.internal.metrics import fsm_storage_seconds
+from database.models import FsmRecord
+
+logger = logging.getLogger(__name__)
+
+
+class _Record:
+    __slots__ = ("data", "saved", "state", "touched")
+
+    def __init__(self, state: str | None = None, data: dict[str, Any] | None = None):
+        self.state = state
+        self.data = data or {}
+        self.touched = time.monotonic()
+        # What the database holds, to skip writes that end where they started
+        self.saved = self.snapshot()
+
+    def snapshot(self) -> tuple[str | None, dict[str, Any]]:
+        return self.state, self.data.copy()
+
+
+class SqliteStorage(BaseStorage):
+    """FSM storage persisted in the app's SQLite database, with an in-memory write-back layer.
+
+    Reads and writes go to memory; a key is loaded from disk the first time it is used.
+    Changes are only marked dirty and reach the database on flush(), so every set_state/
+    update_data made while handling one update costs one transaction at most
+    (see FsmFlushMiddleware). Keys idle for longer than idle_ttl are dropped from memory
+    once flushed, and are read back from disk when they are used again.
+    """
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        *,
+        key_builder: KeyBuilder | None = None,
+        idle_ttl: float = 900.0,
+    ):
+        self.engine = engine
+        self.key_builder = key_builder or DefaultKeyBuilder()
+        self.idle_ttl = idle_ttl
+        self._records: dict[str, _Record] = {}
+        self._dirty: set[str] = set()
+        self._next_eviction = time.monotonic() + idle_ttl
+
+    async def _record(self, key: StorageKey) -> tuple[str, _Record]:
+        db_key = self.key_builder.build(key)
+        record = self._records.get(db_key)
+        if record is None:
+            start = time.perf_counter()
+            async with self.engine.connect() as conn:
+                row = (
+                    await conn.execute(select(FsmRecord.state, FsmRecord.data).where(FsmRecord.key == db_key))
+                ).first()
+            fsm_storage_seconds.observe(time.perf_counter() - start, "load")
+            loaded = _Record(row.state, row.data) if row else _Record()
+            # Another task may have loaded (and changed) the key while we were reading it
+            record = self._records.setdefault(db_key, loaded)
+        record.touched = time.monotonic()
+        return db_key, record
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        db_key, record = await self._record(key)
+        state = state.state if isinstance(state, State) else state
+        if record.state != state:
+            record.state = state
+            self._dirty.add(db_key)
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        _, record = await self._record(key)
+        return record.state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        if not isinstance(data, dict):
+            msg = f"Data must be a dict or dict-like object, got {type(data).__name__}"
+            raise DataNotDictLikeError(msg)
+        db_key, record = await self._record(key)
+        if record.data != data:
+            record.data = data.copy()
+            self._dirty.add(db_key)
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        _, record = await self._record(key)
+        return record.data.copy()
+
+    async def flush(self) -> None:
+        """Write every dirty key in a single transaction."""
+        if self._dirty:
+            batch = {db_key: self._records[db_key] for db_key in self._dirty}
+            self._dirty.clear()
+            snapshots = {db_key: record.snapshot() for db_key, record in batch.items()}
+            changed = {db_key: snapshot for db_key, snapshot in snapshots.items() if snapshot != batch[db_key].saved}
+            upserts = [
+                {"key": db_key, "state": state, "data": data}
+                for db_key, (state, data) in changed.items()
+                if state is not None or data
+            ]
+            deletes = [db_key for db_key, (state, data) in changed.items() if state is None and not data]
+            start = time.perf_counter()
+            try:
+                if changed:
+                    async with self.engine.begin() as conn:
+                        if upserts:
+                            stmt = insert(FsmRecord)
+                            await conn.execute(
+                                stmt.on_conflict_do_update(
+                                    index_elements=[FsmRecord.key],
+                                    set_={
+                                        "state": stmt.excluded.state,
+                                        "data": stmt.excluded.data,
+                                        "updated_at": func.now(),
+                                    },
+                                ),
+                                upserts,
+                            )
+                        if deletes:
+                            await conn.execute(delete(FsmRecord).where(FsmRecord.key.in_(deletes)))
+            except Exception:
+                # Keep the records dirty so the next flush retries them
+                self._dirty.update(batch)
+                raise
+            if changed:
+                fsm_storage_seconds.observe(time.perf_counter() - start, "flush")
+            for db_key, snapshot in changed.items():
+                batch[db_key].saved = snapshot
+
+        if time.monotonic() >= self._next_eviction:
+            self._evict_idle()
+
+    def _evict_idle(self) -> None:
+        now = time.monotonic()
+        idle = [
+            db_key
+            for db_key, record in self._records.items()
+            if db_key not in self._dirty and now - record.touched > self.idle_ttl
+        ]
+        for db_key in idle:
+            del self._records[db_key]
+        self._next_eviction = now + self.idle_ttl
+        if idle:
+            logger.debug("FSM storage: evicted %d idle keys, %d in memory", len(idle), len(self._records))
+
+    async def close(self) -> None:
+        await self.flush()
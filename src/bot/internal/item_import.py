@@ -0,0 +1,221 @@
+import asyncio
+import csv
+import io
+import itertools
+import json
+import time
+from collections.abc import Awaitable, Callable, Iterator, Mapping
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from pathlib import PurePath
+from typing import IO, Any
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from bot.enums import Category, ItemStatus
+from database.crud.item import MAX_TITLE_LENGTH, NewItem, create_items, get_item_keys, item_key
+
+IMPORT_SUFFIXES = (".csv", ".txt", ".json", ".ndjson", ".jsonl")
+# Largest file a bot can download
+MAX_IMPORT_BYTES = 20 * 1024 * 1024
+IMPORT_CHUNK = 200  # items per transaction, a few dozen ms of writing with the triggers
+PROGRESS_INTERVAL = 3.0  # seconds between progress updates
+_READ_SIZE = 64 * 1024
+_MAX_JSON_ELEMENT = 64 * 1024
+
+# Columns and keys, lowercased; the first one with a value is taken
+TITLE_KEYS = ("title", "name")
+DATE_KEYS = ("created_at", "date read", "watched date", "date added", "date")
+# Goodreads' library export: "read", "to-read" or "currently-reading"
+SHELF_KEY = "exclusive shelf"
+# Letterboxd's diary export, only logged films have it
+WATCHED_KEY = "watched date"
+
+
+@dataclass(frozen=True, slots=True)
+class ImportOptions:
+    """Category and status of the items whose file doesn't say."""
+
+    category: Category | None = None
+    status: ItemStatus | None = None
+
+    @classmethod
+    def parse(cls, args: str | None) -> "ImportOptions | None":
+        """Options from /import arguments in any order, e.g. "movies logged"; None if one isn't known."""
+        options: dict[str, Any] = {}
+        for arg in (args or "").lower().split():
+            if arg in Category:
+                options["category"] = Category(arg)
+            elif arg in ItemStatus:
+                options["status"] = ItemStatus(arg)
+            else:
+                return None
+        return cls(**options)
+
+
+@dataclass(slots=True)
+class ImportReport:
+    rows: int = 0
+    added: int = 0
+    duplicates: int = 0  # already in the logbook, or earlier in the file
+    invalid: int = 0  # without a title, or a category to put them in
+    shortened: int = 0  # titles cut to MAX_TITLE_LENGTH
+    error: str | None = None  # why reading the file stopped early
+    failed: bool = False  # stopped by an error of the bot's own, or by the bot stopping
+
+
+def _json_array(text: IO[str]) -> Iterator[Any]:
+    """Elements of a top-level JSON array, decoded one at a time as the text is read."""
+    decoder = json.JSONDecoder()
+    buffer = text.read(_READ_SIZE).lstrip()
+    if not buffer.startswith("["):
+        raise ValueError("not a JSON array")
+    pos, eof = 1, False
+    while True:
+        while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+            pos += 1
+        if pos == len(buffer):
+            if eof:
+                raise ValueError("the JSON array is not closed")
+            chunk = text.read(_READ_SIZE)
+            buffer, pos, eof = chunk, 0, not chunk
+            continue
+        if buffer[pos] == "]":
+            return
+        try:
+            value, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            # An element cut at the end of the buffer: read on, up to a sane size for one item
+            if eof or len(buffer) - pos > _MAX_JSON_ELEMENT:
+                raise
+            chunk = text.read(_READ_SIZE)
+            buffer, pos, eof = buffer[pos:] + chunk, 0, not chunk
+            continue
+        yield value
+        pos = end
+
+
+def _records(file: IO[bytes], suffix: str) -> Iterator[Mapping[str, Any]]:
+    # utf-8-sig: spreadsheets and /export write a BOM in front of CSV files
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="" if suffix == ".csv" else None)
+    if suffix == ".csv":
+        reader = csv.DictReader(text)
+        reader.fieldnames = [name.strip().lower() for name in reader.fieldnames or ()]
+        if not any(key in reader.fieldnames for key in TITLE_KEYS):
+            raise ValueError("no Title or Name column")
+        yield from reader
+    elif suffix == ".txt":
+        yield from ({"title": line} for line in text if line.strip())
+    else:
+        values = _json_array(text) if suffix == ".json" else (json.loads(line) for line in text if line.strip())
+        for value in values:
+            yield {str(key).lower(): item for key, item in value.items()} if isinstance(value, dict) else {}
+
+
+def _first(record: Mapping[str, Any], keys: tuple[str, ...]) -> str:
+    return next((str(value).strip() for key in keys if (value := record.get(key)) not in (None, "")), "")
+
+
+def _date(value: str) -> datetime | None:
+    try:
+        parsed = datetime.fromisoformat(value.replace("/", "-"))
+    except ValueError:
+        return None
+    return parsed.astimezone(UTC).replace(tzinfo=None) if parsed.tzinfo else parsed
+
+
+def _item(record: Mapping[str, Any], options: ImportOptions, report: ImportReport) -> NewItem | None:
+    title = " ".join(_first(record, TITLE_KEYS).split())
+    if not title:
+        return None
+    if len(title) > MAX_TITLE_LENGTH:
+        title = title[:MAX_TITLE_LENGTH].rstrip()
+        report.shortened += 1
+
+    category = options.category
+    if value := _first(record, ("category",)).lower():
+        if value not in Category:
+            return None
+        category = Category(value)
+    elif category is None:
+        # Goodreads exports books and Letterboxd films, neither says so
+        if SHELF_KEY in record:
+            category = Category.BOOKS
+        elif "letterboxd uri" in record:
+            category = Category.MOVIES
+        else:
+            return None
+
+    status = options.status or ItemStatus.BACKLOG
+    if value := _first(record, ("status",)).lower():
+        status = ItemStatus(value) if value in ItemStatus else status
+    elif shelf := _first(record, (SHELF_KEY,)):
+        status = ItemStatus.LOGGED if shelf.lower() == "read" else ItemStatus.BACKLOG
+    elif _first(record, (WATCHED_KEY,)):
+        status = ItemStatus.LOGGED
+
+    return NewItem(title, category, status, _date(_first(record, DATE_KEYS)))
+
+
+def read_items(file: IO[bytes], filename: str, options: ImportOptions, report: ImportReport) -> Iterator[NewItem]:
+    """Items in an uploaded file, parsed as it is read.
+
+    CSV with a Title or Name column (Goodreads, Letterboxd and /export files among them), one title
+    per line of TXT, or JSON objects in an array or one per line. Rows that can't be items are
+    counted in report.invalid; a file that can't be read to the end stops with report.error set.
+    """
+    suffix = PurePath(filename).suffix.lower()
+    try:
+        for record in _records(file, suffix):
+            report.rows += 1
+            item = _item(record, options, report)
+            if item is None:
+                report.invalid += 1
+            else:
+                yield item
+    except (ValueError, csv.Error) as exc:
+        report.error = f"row {report.rows + 1}: {exc}" if report.rows else str(exc)
+
+
+async def import_items(
+    user_id: int,
+    items: Iterator[NewItem],
+    session_factory: async_sessionmaker[AsyncSession],
+    report: ImportReport,
+    on_progress: Callable[[ImportReport], Awaitable[None]],
+    progress_interval: float = PROGRESS_INTERVAL,
+) -> None:
+    """Add the items the user doesn't have yet, IMPORT_CHUNK per transaction.
+
+    Short transactions let other users' writes in between chunks, and whatever was added before a
+    failure stays. items are taken IMPORT_CHUNK at a time in a worker thread: parsing the file
+    doesn't hold the event loop, even through a long run of rows that are never written. on_progress
+    is awaited after a chunk at most every progress_interval seconds.
+    """
+    async with session_factory() as session:
+        seen = await get_item_keys(user_id, session)
+
+    batch: list[NewItem] = []
+    next_progress = time.monotonic() + progress_interval
+
+    async def _write() -> None:
+        nonlocal next_progress
+        async with session_factory() as session, session.begin():
+            report.added += await create_items(user_id, batch, session)
+        batch.clear()
+        if time.monotonic() >= next_progress:
+            await on_progress(report)
+            next_progress = time.monotonic() + progress_interval
+
+    while parsed := await asyncio.to_thread(list, itertools.islice(items, IMPORT_CHUNK)):
+        for item in parsed:
+            key = item_key(item.category, item.title)
+            if key in seen:
+                report.duplicates += 1
+                continue
+            seen.add(key)
+            batch.append(item)
+            if len(batch) == IMPORT_CHUNK:
+                await _write()
+    if batch:
+        await _write()
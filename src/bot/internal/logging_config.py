@@ -1,28 +1,60 @@
 import logging.config
+import queue
 import sys
 from datetime import datetime
 from logging import Formatter
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, RotatingFileHandler
 from pathlib import Path
 
+from bot.enums import UpdateDumpMode
+
 
 class CustomFormatter(Formatter):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # (whole second, "date time", "tz") of the last record: most records share their second
+        self._time_cache: tuple[int, str, str] = (-1, "", "")
+
     def formatTime(self, record, datefmt=None):
-        ct = datetime.fromtimestamp(record.created).astimezone()
         if datefmt:
-            base_time = ct.strftime("%d.%m.%Y %H:%M:%S")
-            msecs = f"{int(record.msecs):03d}"
-            tz = ct.strftime("%z")
-            return f"{base_time}.{msecs}{tz}"
+            second = int(record.created)
+            cached_second, base_time, tz = self._time_cache
+            if second != cached_second:
+                ct = datetime.fromtimestamp(second).astimezone()
+                base_time = ct.strftime("%d.%m.%Y %H:%M:%S")
+                tz = ct.strftime("%z")
+                self._time_cache = (second, base_time, tz)
+            return f"{base_time}.{int(record.msecs):03d}{tz}"
         return super().formatTime(record, datefmt)
 
 
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler for a bounded queue: records that don't fit are dropped and counted instead of blocking."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
 MAIN_FORMAT = "%(asctime)s | %(message)s"
 ERROR_FORMAT = "%(asctime)s [%(levelname)8s] [%(module)s:%(funcName)s:%(lineno)d] %(message)s"
 DATE_FORMAT = "%d.%m.%Y %H:%M:%S%z"
+LOG_QUEUE_SIZE = 10_000
+UPDATES_LOGGER = "updates"
+QUEUE_HANDLERS = ("queue", "updates_queue")
 
 
-def get_logging_config(app_name: str):
+def get_logging_config(
+    app_name: str,
+    queue_size: int = LOG_QUEUE_SIZE,
+    update_dump_mode: UpdateDumpMode = UpdateDumpMode.FAILED,
+):
     return {
         "version": 1,
         "disable_existing_loggers": False,
@@ -60,16 +92,62 @@ def get_logging_config(app_name: str):
                 "backupCount": 3,
                 "encoding": "utf-8",
             },
+            # The only handler on the event loop: formatting and I/O happen in the listener's thread
+            "queue": {
+                "class": DroppingQueueHandler,
+                "queue": {"()": queue.Queue, "maxsize": queue_size},
+                "handlers": ["stdout", "stderr", "file"],
+                "respect_handler_level": True,
+            },
+            "updates_file": {
+                "()": RotatingFileHandler,
+                "formatter": "main",
+                "filename": f"logs/{app_name}_updates.log",
+                "maxBytes": 50_000_000,  # 50MB
+                "backupCount": 3,
+                "encoding": "utf-8",
+            },
+            # Update dumps get a queue of their own so a burst of them can't crowd out the main log
+            "updates_queue": {
+                "class": DroppingQueueHandler,
+                "queue": {"()": queue.Queue, "maxsize": queue_size},
+                "handlers": ["updates_file"],
+            },
         },
         "loggers": {
             "root": {
                 "level": "DEBUG",
-                "handlers": ["stdout", "stderr", "file"],
+                "handlers": ["queue"],
+            },
+            # Dumps are DEBUG records: with dumping off the logger drops them before they are serialized
+            UPDATES_LOGGER: {
+                "level": "INFO" if update_dump_mode == UpdateDumpMode.OFF else "DEBUG",
+                "handlers": ["updates_queue"],
+                "propagate": False,
             },
         },
     }
 
 
-def setup_logging(app_name: str) -> None:
+def setup_logging(
+    app_name: str,
+    queue_size: int = LOG_QUEUE_SIZE,
+    update_dump_mode: UpdateDumpMode = UpdateDumpMode.FAILED,
+) -> None:
     Path("logs").mkdir(parents=True, exist_ok=True)
-    logging.config.dictConfig(get_logging_config(app_name))
+    logging.config.dictConfig(get_logging_config(app_name, queue_size, update_dump_mode))
+    for name in QUEUE_HANDLERS:
+        logging.getHandlerByName(name).listener.start()
+
+
+def stop_logging() -> None:
+    """Write out the records still queued and stop the listener threads."""
+    # The main queue last, it takes the drop warnings
+    for name in reversed(QUEUE_HANDLERS):
+        handler = logging.getHandlerByName(name)
+        if not isinstance(handler, DroppingQueueHandler) or handler.listener is None:
+            continue
+        if handler.dropped:
+            logging.getLogger(__name__).warning("Dropped %d records from the %s log queue", handler.dropped, name)
+            handler.dropped = 0
+        handler.listener.stop()
@@ -0,0 +1,116 @@
+import itertools
+import time
+import weakref
+from collections import OrderedDict
+from datetime import datetime
+from typing import NamedTuple, Self
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from bot.enums import Category, ItemStatus
+from database.crud.item import CHANGED_ITEM_USERS
+from database.models import Item
+
+
+class FoundItem(NamedTuple):
+    """What an inline result shows of an item, kept apart from the session that read it."""
+
+    id: int
+    title: str
+    category: Category
+    status: ItemStatus
+    created_at: datetime
+
+    @classmethod
+    def of(cls, item: Item) -> Self:
+        return cls(item.id, item.title, item.category, item.status, item.created_at)
+
+
+class _UserResults:
+    __slots__ = ("generation", "results")
+
+    def __init__(self, generation: int):
+        # Changes whenever the user's items do, results read before that are not stored
+        self.generation = generation
+        self.results: OrderedDict[str, tuple[float, list[FoundItem]]] = OrderedDict()
+
+
+class SearchCache:
+    """Search results of the most recent users by query, with a per-entry TTL.
+
+    A user's results are dropped once a transaction that changed their items commits (see
+    CHANGED_ITEM_USERS), in every cache of the process. Take generation() before searching and
+    pass it to put(): results read before a change and stored after it are discarded.
+    """
+
+    def __init__(self, maxsize: int = 10_000, ttl: float = 300.0, queries_per_user: int = 32):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.queries_per_user = queries_per_user
+        self._users: OrderedDict[int, _UserResults] = OrderedDict()
+        self._generations = itertools.count(1)
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        _caches.add(self)
+
+    def __len__(self) -> int:
+        return sum(len(entry.results) for entry in self._users.values())
+
+    def _entry(self, user_id: int) -> _UserResults:
+        entry = self._users.get(user_id)
+        if entry is None:
+            entry = self._users[user_id] = _UserResults(next(self._generations))
+            while len(self._users) > self.maxsize:
+                self._users.popitem(last=False)
+        self._users.move_to_end(user_id)
+        return entry
+
+    def generation(self, user_id: int) -> int:
+        return self._entry(user_id).generation
+
+    def get(self, user_id: int, query: str) -> list[FoundItem] | None:
+        entry = self._users.get(user_id)
+        cached = entry.results.get(query) if entry is not None else None
+        if cached is None or cached[0] < time.monotonic():
+            if cached is not None:
+                del entry.results[query]
+            self.misses += 1
+            return None
+        self._users.move_to_end(user_id)
+        entry.results.move_to_end(query)
+        self.hits += 1
+        return cached[1]
+
+    def put(self, user_id: int, query: str, items: list[FoundItem], generation: int) -> None:
+        entry = self._users.get(user_id)
+        if entry is None or entry.generation != generation:
+            return
+        entry.results[query] = (time.monotonic() + self.ttl, items)
+        entry.results.move_to_end(query)
+        while len(entry.results) > self.queries_per_user:
+            entry.results.popitem(last=False)
+
+    def invalidate(self, user_id: int) -> None:
+        entry = self._users.get(user_id)
+        if entry is not None:
+            entry.generation = next(self._generations)
+            entry.results.clear()
+            self.invalidations += 1
+
+
+# Session events are global, the caches they invalidate are made by build_app()
+_caches: weakref.WeakSet[SearchCache] = weakref.WeakSet()
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed(session: Session) -> None:
+    for user_id in session.info.pop(CHANGED_ITEM_USERS, ()):
+        for cache in _caches:
+            cache.invalidate(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_changed(session: Session) -> None:
+    session.info.pop(CHANGED_ITEM_USERS, None)
@@ -1,10 +1,89 @@
+import hashlib
+from collections.abc import Mapping
+from typing import Any
+
 from aiogram import Bot
 from aiogram.exceptions import TelegramBadRequest
 from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import StateType
 from aiogram.types import CallbackQuery, InlineKeyboardMarkup, Message
 
+from bot.internal.background import BackgroundTasks
+
 MAIN_WINDOW_CHAT_ID_KEY = "main_window_chat_id"
 MAIN_WINDOW_MESSAGE_ID_KEY = "main_window_message_id"
+# Digest of the text and markup last rendered to the main window
+MAIN_WINDOW_DIGEST_KEY = "main_window_digest"
+MAIN_WINDOW_KEYS = (MAIN_WINDOW_CHAT_ID_KEY, MAIN_WINDOW_MESSAGE_ID_KEY, MAIN_WINDOW_DIGEST_KEY)
+
+
+class RenderStats:
+    """Counters of main window renders, by what it took to show them."""
+
+    def __init__(self):
+        self.edits = 0
+        self.sends = 0
+        # Identical to the last render, no API call made
+        self.skipped = 0
+        # Edits Telegram rejected with "message is not modified", i.e. wasted calls
+        self.not_modified = 0
+
+
+render_stats = RenderStats()
+
+
+class BufferedFSMContext(FSMContext):
+    """Per-update snapshot of an FSMContext.
+
+    State comes from the value the dispatcher already read for filtering, data is read from the
+    storage on first use, and every change is kept in memory until commit() writes the final
+    state and data back: at most one get_data, one set_state and one set_data per update,
+    whatever the handler and the render helpers below do in between.
+    """
+
+    def __init__(self, context: FSMContext, raw_state: str | None):
+        super().__init__(storage=context.storage, key=context.key)
+        self._state = self._saved_state = raw_state
+        self._data: dict[str, Any] | None = None
+        self._saved_data: dict[str, Any] | None = None
+
+    async def _loaded_data(self) -> dict[str, Any]:
+        if self._data is None:
+            self._data = await self.storage.get_data(key=self.key)
+            self._saved_data = self._data.copy()
+        return self._data
+
+    async def set_state(self, state: StateType = None) -> None:
+        self._state = state.state if isinstance(state, State) else state
+
+    async def get_state(self) -> str | None:
+        return self._state
+
+    async def set_data(self, data: Mapping[str, Any]) -> None:
+        self._data = dict(data)
+
+    async def get_data(self) -> dict[str, Any]:
+        return (await self._loaded_data()).copy()
+
+    async def get_value(self, key: str, default: Any | None = None) -> Any | None:
+        return (await self._loaded_data()).get(key, default)
+
+    async def update_data(self, data: Mapping[str, Any] | None = None, **kwargs: Any) -> dict[str, Any]:
+        if data:
+            kwargs.update(data)
+        merged = {**await self._loaded_data(), **kwargs}
+        self._data = merged
+        return merged.copy()
+
+    async def commit(self) -> None:
+        """Write the state and data back to the storage, skipping whatever ended up unchanged."""
+        if self._state != self._saved_state:
+            await self.storage.set_state(key=self.key, state=self._state)
+            self._saved_state = self._state
+        if self._data is not None and self._data != self._saved_data:
+            await self.storage.set_data(key=self.key, data=self._data)
+            self._saved_data = self._data.copy()
 
 
 def _message_ref(message: Message) -> tuple[int, int]:
@@ -23,20 +102,26 @@ async def get_main_window(state: FSMContext) -> tuple[int, int] | None:
     return _main_window_from_data(await state.get_data())
 
 
-async def set_main_window(state: FSMContext, chat_id: int, message_id: int) -> None:
+async def set_main_window(state: FSMContext, chat_id: int, message_id: int, digest: str | None = None) -> None:
     await state.update_data(
         **{
             MAIN_WINDOW_CHAT_ID_KEY: chat_id,
             MAIN_WINDOW_MESSAGE_ID_KEY: message_id,
+            MAIN_WINDOW_DIGEST_KEY: digest,
         }
     )
 
 
 async def clear_flow_state(state: FSMContext) -> None:
-    main_window = await get_main_window(state)
+    data = await state.get_data()
     await state.clear()
-    if main_window is not None:
-        await set_main_window(state, *main_window)
+    if _main_window_from_data(data) is not None:
+        await state.update_data({key: data.get(key) for key in MAIN_WINDOW_KEYS})
+
+
+def _render_digest(text: str, reply_markup: InlineKeyboardMarkup | None) -> str:
+    markup = reply_markup.model_dump_json(exclude_none=True) if reply_markup else ""
+    return hashlib.blake2b(f"{text}\0{markup}".encode(), digest_size=8).hexdigest()
 
 
 async def _try_edit_message(
@@ -54,8 +139,12 @@ async def _try_edit_message(
             reply_markup=reply_markup,
         )
     except TelegramBadRequest as exc:
-        return "message is not modified" in str(exc).lower()
+        if "message is not modified" in str(exc).lower():
+            render_stats.not_modified += 1
+            return True
+        return False
 
+    render_stats.edits += 1
     return True
 
 
@@ -74,30 +163,44 @@ async def _render_main_window(
     reply_markup: InlineKeyboardMarkup | None,
     preferred_target: tuple[int, int] | None,
 ) -> tuple[int, int]:
-    target = preferred_target or await get_main_window(state)
+    data = await state.get_data()
+    main_window = _main_window_from_data(data)
+    target = preferred_target or main_window
+    digest = _render_digest(text, reply_markup)
+    # Skipped only for a button tapped on the main window itself, which shows the message is still
+    # there. Once the user deleted it, the same screen has to go through the edit and send below
+    if target == main_window == _message_ref(fallback_message) and data.get(MAIN_WINDOW_DIGEST_KEY) == digest:
+        render_stats.skipped += 1
+        return target
+
     if target is not None and await _try_edit_message(bot, target[0], target[1], text, reply_markup):
-        await set_main_window(state, *target)
+        await set_main_window(state, *target, digest)
         return target
 
     sent = await fallback_message.answer(text=text, reply_markup=reply_markup)
+    render_stats.sends += 1
     rendered_to = _message_ref(sent)
-    await set_main_window(state, *rendered_to)
+    await set_main_window(state, *rendered_to, digest)
     return rendered_to
 
 
 async def render_main_window_from_message(
     message: Message,
     state: FSMContext,
+    background_tasks: BackgroundTasks,
     text: str,
     reply_markup: InlineKeyboardMarkup | None = None,
 ) -> tuple[int, int]:
     previous_main_window = await get_main_window(state)
     sent = await message.answer(text=text, reply_markup=reply_markup)
+    render_stats.sends += 1
     rendered_to = _message_ref(sent)
-    await set_main_window(state, *rendered_to)
+    await set_main_window(state, *rendered_to, _render_digest(text, reply_markup))
 
     if previous_main_window is not None and previous_main_window != rendered_to:
-        await _try_clear_keyboard(message.bot, previous_main_window[0], previous_main_window[1])
+        await background_tasks.side_call(
+            _try_clear_keyboard(message.bot, previous_main_window[0], previous_main_window[1])
+        )
 
     return rendered_to
 
@@ -105,6 +208,7 @@ async def render_main_window_from_message(
 async def render_main_window_from_callback(
     callback: CallbackQuery,
     state: FSMContext,
+    background_tasks: BackgroundTasks,
     text: str,
     reply_markup: InlineKeyboardMarkup | None = None,
 ) -> tuple[int, int]:
@@ -119,5 +223,5 @@ async def render_main_window_from_callback(
         preferred_target=target,
     )
     if source != rendered_to:
-        await _try_clear_keyboard(callback.bot, source[0], source[1])
+        await background_tasks.side_call(_try_clear_keyboard(callback.bot, source[0], source[1]))
     return rendered_to
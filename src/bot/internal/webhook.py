@@ -0,0 +1,88 @@
+import asyncio
+import logging
+import signal
+from contextlib import suppress
+from typing import Any
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+from bot.config import Settings
+
+logger = logging.getLogger(__name__)
+
+
+class BoundedRequestHandler(SimpleRequestHandler):
+    """Feeds webhook updates to the dispatcher with at most max_concurrency of them in flight.
+
+    Updates are handled while Telegram waits for the response, so a method returned by a
+    handler (e.g. `return callback.answer()`) is sent back inline in the webhook response
+    instead of costing a separate Bot API request. Requests over the limit wait for a slot.
+    """
+
+    def __init__(
+        self,
+        dispatcher: Dispatcher,
+        bot: Bot,
+        *,
+        max_concurrency: int,
+        secret_token: str | None = None,
+        **data: Any,
+    ):
+        super().__init__(dispatcher, bot, handle_in_background=False, secret_token=secret_token, **data)
+        self._slots = asyncio.Semaphore(max_concurrency)
+
+    async def _handle_request(self, bot: Bot, request: web.Request) -> web.Response:
+        async with self._slots:
+            return await super()._handle_request(bot, request)
+
+
+def create_webhook_app(dp: Dispatcher, bot: Bot, settings: Settings) -> web.Application:
+    secret = settings.webhook_secret.get_secret_value() if settings.webhook_secret else None
+    app = web.Application()
+    # Emits dp startup/shutdown with the app, like start_polling does. Registered before the
+    # handler so the shutdown notification goes out before the handler closes the bot session
+    setup_application(app, dp, bot=bot)
+    BoundedRequestHandler(
+        dp,
+        bot,
+        max_concurrency=settings.webhook_max_concurrency,
+        secret_token=secret,
+    ).register(app, path=settings.webhook_path)
+
+    async def _set_webhook(_: web.Application) -> None:
+        await bot.set_webhook(
+            url=settings.webhook_url,
+            secret_token=secret,
+            max_connections=settings.webhook_max_concurrency,
+            allowed_updates=dp.resolve_used_update_types(),
+        )
+        logger.info("Webhook set to %s", settings.webhook_url)
+
+    app.on_startup.append(_set_webhook)
+    return app
+
+
+async def run_webhook(dp: Dispatcher, bot: Bot, settings: Settings) -> None:
+    """Serve the webhook until SIGINT/SIGTERM. TLS is expected to be terminated by a proxy."""
+    runner = web.AppRunner(create_webhook_app(dp, bot, settings), handle_signals=False)
+    await runner.setup()
+
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        with suppress(NotImplementedError):
+            loop.add_signal_handler(sig, stopping.set)
+
+    try:
+        site = web.TCPSite(runner, settings.webhook_host, settings.webhook_port)
+        await site.start()
+        logger.info("Listening for webhook updates on %s:%d", settings.webhook_host, settings.webhook_port)
+        await stopping.wait()
+    finally:
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            with suppress(NotImplementedError):
+                loop.remove_signal_handler(sig)
+        # Waits for in-flight requests, then runs the dispatcher shutdown
+        await runner.cleanup()
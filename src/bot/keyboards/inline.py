@@ -3,12 +3,14 @@ from aiogram.filters.callback_data import CallbackData
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
 from bot.enums import Category, ItemStatus
+from database.crud.item import ItemsPage
+from database.models import Item
 
 
 class MenuCb(CallbackData, prefix="m"):
     action: str
     category: str | None = None
-    page: int = 0
+    cursor: str | None = None
     year: int | None = None
 
 
@@ -16,7 +18,14 @@ class ItemCb(CallbackData, prefix="i"):
     action: str
     id: int | None = None
     category: str | None = None
-    page: int = 0
+    cursor: str | None = None
+
+
+def is_navigation_callback(data: str) -> bool:
+    """Read-only taps that only move the main window: a newer one makes a pending older one pointless."""
+    if data.startswith(f"{MenuCb.__prefix__}{MenuCb.__separator__}"):
+        return True
+    return data.startswith(f"{ItemCb.__prefix__}{ItemCb.__separator__}view{ItemCb.__separator__}")
 
 
 CATEGORY_EMOJI = {
@@ -35,6 +44,10 @@ def main_menu_kb():
             callback_data=MenuCb(action="category", category=cat.value),
             style=ButtonStyle.PRIMARY,
         )
+    builder.button(
+        text="\U0001f50d Search",
+        callback_data=MenuCb(action="search"),
+    )
     builder.adjust(1)
     return builder.as_markup()
 
@@ -69,25 +82,28 @@ def category_menu_kb(category: str, backlog_count: int, logged_count: int):
     return builder.as_markup()
 
 
-def items_list_kb(items: list, category: str, status: ItemStatus, page: int, total: int, page_size: int):
+def items_list_kb(page: ItemsPage, category: str, status: ItemStatus):
     builder = InlineKeyboardBuilder()
     emoji = CATEGORY_EMOJI[Category(category)]
-    for item in items:
+    cursor = page.cursor.pack() if page.cursor else None
+    for item in page.items:
         builder.button(
             text=f"{emoji} {item.title}",
-            callback_data=ItemCb(action="view", id=item.id, page=page),
+            callback_data=ItemCb(action="view", id=item.id, cursor=cursor),
             style=ButtonStyle.PRIMARY,
         )
 
     # Pagination
-    has_prev = page > 0
-    has_next = (page + 1) * page_size < total
-
-    if has_prev or has_next:
-        if has_prev:
-            builder.button(text="\u25c0", callback_data=MenuCb(action=status.value, category=category, page=page - 1))
-        if has_next:
-            builder.button(text="\u25b6", callback_data=MenuCb(action=status.value, category=category, page=page + 1))
+    if page.prev:
+        builder.button(
+            text="\u25c0",
+            callback_data=MenuCb(action=status.value, category=category, cursor=page.prev.pack()),
+        )
+    if page.next:
+        builder.button(
+            text="\u25b6",
+            callback_data=MenuCb(action=status.value, category=category, cursor=page.next.pack()),
+        )
 
     builder.button(
         text="\u2b05 Back",
@@ -95,42 +111,63 @@ def items_list_kb(items: list, category: str, status: ItemStatus, page: int, tot
     )
 
     # Adjust: items 1 per row, pagination buttons together, back alone
-    rows = [1] * len(items)
-    if has_prev or has_next:
-        rows.append(2 if has_prev and has_next else 1)
+    rows = [1] * len(page.items)
+    if page.prev or page.next:
+        rows.append(2 if page.prev and page.next else 1)
     rows.append(1)
     builder.adjust(*rows)
 
     return builder.as_markup()
 
 
-def item_detail_kb(item_id: int, category: str, status: ItemStatus, page: int = 0):
+def item_detail_kb(item_id: int, category: str, status: ItemStatus, cursor: str | None = None):
     builder = InlineKeyboardBuilder()
     if status == ItemStatus.BACKLOG:
         builder.button(
             text="\u2705 Log",
-            callback_data=ItemCb(action="log", id=item_id, page=page),
+            callback_data=ItemCb(action="log", id=item_id, cursor=cursor),
             style=ButtonStyle.SUCCESS,
         )
     builder.button(
         text="\u270f\ufe0f",
-        callback_data=ItemCb(action="edit", id=item_id, category=category, page=page),
+        callback_data=ItemCb(action="edit", id=item_id, category=category, cursor=cursor),
         style=ButtonStyle.PRIMARY,
     )
     builder.button(
         text="\U0001f5d1",
-        callback_data=ItemCb(action="delete", id=item_id, page=page),
+        callback_data=ItemCb(action="delete", id=item_id, cursor=cursor),
         style=ButtonStyle.DANGER,
     )
     builder.button(
         text="\u2b05 Back",
-        callback_data=MenuCb(action=status.value, category=category, page=page),
+        callback_data=MenuCb(action=status.value, category=category, cursor=cursor),
     )
     # 3 buttons for backlog (Log, Edit, Delete), 2 for logged (Edit, Delete)
     builder.adjust(3 if status == ItemStatus.BACKLOG else 2, 1)
     return builder.as_markup()
 
 
+def search_results_kb(items: list[Item]):
+    builder = InlineKeyboardBuilder()
+    for item in items:
+        logged = "\u2705 " if item.status == ItemStatus.LOGGED else ""
+        builder.button(
+            text=f"{CATEGORY_EMOJI[item.category]} {logged}{item.title}",
+            callback_data=ItemCb(action="view", id=item.id),
+            style=ButtonStyle.PRIMARY,
+        )
+    builder.button(
+        text="\U0001f50d New search",
+        callback_data=MenuCb(action="search"),
+    )
+    builder.button(
+        text="\u2b05 Back",
+        callback_data=MenuCb(action="main"),
+    )
+    builder.adjust(1)
+    return builder.as_markup()
+
+
 def cancel_kb():
     builder = InlineKeyboardBuilder()
     builder.button(
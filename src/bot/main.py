@@ -1,25 +1,46 @@
 import asyncio
 import logging
 from contextlib import suppress
+from dataclasses import dataclass
 
 import sentry_sdk
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.base import BaseSession
 from aiogram.enums import ParseMode
-from aiogram.fsm.storage.memory import MemoryStorage
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
 
-from bot.config import APP_NAME, get_settings
-from bot.enums import Stage
+from bot.config import APP_NAME, Settings, get_settings
+from bot.enums import RunMode, Stage
 from bot.handlers.callbacks import router as callbacks_router
 from bot.handlers.errors import router as errors_router
+from bot.handlers.export import router as export_router
+from bot.handlers.import_items import router as import_router
+from bot.handlers.inline_query import router as inline_query_router
+from bot.handlers.search import router as search_router
 from bot.handlers.start import router as start_router
-from bot.internal.logging_config import setup_logging
+from bot.internal.background import BackgroundTasks
+from bot.internal.export import FileJobs
+from bot.internal.fsm_storage import SqliteStorage
+from bot.internal.logging_config import setup_logging, stop_logging
+from bot.internal.metrics import registry, start_metrics_server
 from bot.internal.notify import on_shutdown, on_startup
+from bot.internal.search_cache import SearchCache
+from bot.internal.ui import render_stats
+from bot.internal.user_cache import UserCache
+from bot.internal.webhook import run_webhook
+from bot.keyboards.inline import is_navigation_callback
+from bot.middlewares.api_metrics import ApiMetricsMiddleware
 from bot.middlewares.auth import AuthMiddleware
+from bot.middlewares.fsm_buffer import FsmBufferMiddleware
+from bot.middlewares.fsm_flush import FsmFlushMiddleware
 from bot.middlewares.logging import LoggingMiddleware
+from bot.middlewares.metrics import MetricsMiddleware
+from bot.middlewares.rate_limit import RateLimitMiddleware
 from bot.middlewares.session import DbSessionMiddleware
 from bot.middlewares.updates_dumper import UpdatesDumperMiddleware
-from database.db import get_engine, get_session_factory
+from bot.middlewares.user_queue import UserQueueMiddleware
+from database.db import get_checkpointer, get_engine, get_session_factory
 from database.models import Base
 
 logger = logging.getLogger(__name__)
@@ -43,68 +64,284 @@ def setup_sentry(dsn: str | None, stage: Stage) -> None:
     logger.info("Sentry initialized")
 
 
+def _create_indexes(conn) -> None:
+    # create_all() skips the indexes of tables that already exist
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+
 async def init_db(engine) -> None:
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_create_indexes)
     logger.info("Database tables created")
 
 
-async def main() -> None:
-    setup_logging(APP_NAME)
-    settings = get_settings()
+def _register_stats_metrics(
+    user_cache: UserCache,
+    user_queue: UserQueueMiddleware,
+    rate_limiter: RateLimitMiddleware | None,
+    background_tasks: BackgroundTasks,
+    search_cache: SearchCache,
+    exports: FileJobs,
+    imports: FileJobs,
+) -> None:
+    # Counters kept by the components themselves, read when the metrics are scraped
+    registry.counter_callback("bot_render_edits_total", "Main window renders by edit", lambda: render_stats.edits)
+    registry.counter_callback(
+        "bot_render_sends_total", "Main window renders by new message", lambda: render_stats.sends
+    )
+    registry.counter_callback(
+        "bot_render_skipped_total", "Main window renders skipped as unchanged", lambda: render_stats.skipped
+    )
+    registry.counter_callback(
+        "bot_render_not_modified_total", "Edits rejected as not modified", lambda: render_stats.not_modified
+    )
+    registry.counter_callback("bot_user_cache_hits_total", "User cache hits", lambda: user_cache.hits)
+    registry.counter_callback("bot_user_cache_misses_total", "User cache misses", lambda: user_cache.misses)
+    registry.gauge_callback("bot_user_cache_size", "Users in the cache", lambda: len(user_cache))
+    registry.counter_callback("bot_search_cache_hits_total", "Inline search cache hits", lambda: search_cache.hits)
+    registry.counter_callback(
+        "bot_search_cache_misses_total", "Inline search cache misses", lambda: search_cache.misses
+    )
+    registry.counter_callback(
+        "bot_inline_debounced_total", "Inline queries dropped for a newer one", lambda: user_queue.stats.debounced
+    )
+    registry.gauge_callback("bot_exports_running", "Exports being written or sent", lambda: exports.running)
+    registry.counter_callback(
+        "bot_exports_rejected_total", "Exports turned away at the concurrency cap", lambda: exports.rejected
+    )
+    registry.gauge_callback("bot_imports_running", "Imports being read or written", lambda: imports.running)
+    registry.counter_callback(
+        "bot_imports_rejected_total", "Imports turned away at the concurrency cap", lambda: imports.rejected
+    )
+    registry.gauge_callback("bot_updates_queued", "Updates waiting for their turn", lambda: user_queue.stats.queued)
+    registry.counter_callback(
+        "bot_update_wait_seconds_total", "Time updates spent queued", lambda: user_queue.stats.wait_total
+    )
+    registry.counter_callback(
+        "bot_updates_collapsed_total", "Navigation taps dropped for a newer one", lambda: user_queue.stats.collapsed
+    )
+    registry.gauge_callback("bot_background_tasks", "Background calls running", lambda: len(background_tasks))
+    registry.counter_callback(
+        "bot_background_failures_total", "Background calls that failed", lambda: background_tasks.failed
+    )
+    if rate_limiter is not None:
+        stats = rate_limiter.stats
+        registry.gauge_callback("bot_api_queued", "Bot API calls waiting for a token", lambda: stats.queued)
+        registry.counter_callback(
+            "bot_api_wait_seconds_total", "Time Bot API calls spent waiting for a token", lambda: stats.wait_total
+        )
+        registry.counter_callback("bot_api_flood_errors_total", "Bot API 429 responses", lambda: stats.retry_after)
 
-    setup_sentry(settings.sentry_dsn, settings.bot_stage)
 
-    settings.db_path.parent.mkdir(parents=True, exist_ok=True)
+@dataclass
+class BotApp:
+    bot: Bot
+    dp: Dispatcher
+    user_cache: UserCache
+    user_queue: UserQueueMiddleware
+    rate_limiter: RateLimitMiddleware | None
+    background_tasks: BackgroundTasks
+    search_cache: SearchCache
+    exports: FileJobs
+    imports: FileJobs
 
-    engine = get_engine()
-    session_factory = get_session_factory(engine)
 
-    await init_db(engine)
+def build_app(
+    settings: Settings,
+    engine: AsyncEngine,
+    session_factory: async_sessionmaker[AsyncSession],
+    session: BaseSession | None = None,
+) -> BotApp:
+    """Assemble the bot and the dispatcher with all middlewares and routers.
 
+    session replaces the bot's default HTTP session, e.g. to point it at another Bot API server.
+    """
     bot = Bot(
         token=settings.bot_token.get_secret_value(),
+        session=session,
         default=DefaultBotProperties(parse_mode=ParseMode.HTML),
     )
-    dp = Dispatcher(storage=MemoryStorage())
+    rate_limiter = None
+    if settings.api_rate_limit > 0:
+        rate_limiter = RateLimitMiddleware(
+            settings.api_rate_limit,
+            settings.api_chat_rate_limit,
+            settings.api_chat_burst,
+            settings.api_max_retries,
+        )
+        bot.session.middleware(rate_limiter)
+    # After the rate limiter, so the time waiting for a token isn't counted as API latency
+    bot.session.middleware(ApiMetricsMiddleware())
+    storage = SqliteStorage(engine, idle_ttl=settings.fsm_idle_ttl)
+    background_tasks = BackgroundTasks(settings.background_side_calls)
+    search_cache = SearchCache(settings.search_cache_size, settings.search_cache_ttl)
+    exports = FileJobs(settings.export_max_concurrency, settings.file_spool_size)
+    imports = FileJobs(settings.import_max_concurrency, settings.file_spool_size)
+    # Workflow data every handler can ask for: session_factory is for the handlers that manage their own
+    # transactions, like the import
+    dp = Dispatcher(
+        storage=storage,
+        session_factory=session_factory,
+        background_tasks=background_tasks,
+        search_cache=search_cache,
+        exports=exports,
+        imports=imports,
+    )
 
     async def _on_startup():
         await on_startup(bot, settings)
 
     async def _on_shutdown():
+        # Before the bot session closes under them
+        await background_tasks.drain(settings.background_drain_timeout)
         await on_shutdown(bot, settings)
 
     dp.startup.register(_on_startup)
     dp.shutdown.register(_on_shutdown)
 
     # Outer middleware (runs first)
-    dp.update.outer_middleware(UpdatesDumperMiddleware())
+    dp.update.outer_middleware(MetricsMiddleware())
+    dp.update.outer_middleware(
+        UpdatesDumperMiddleware(
+            settings.update_dump_mode,
+            settings.update_dump_sample_percent,
+            settings.update_dump_max_chars,
+        )
+    )
+    user_queue = UserQueueMiddleware(
+        settings.update_max_concurrency,
+        is_navigation_callback if settings.collapse_navigation else None,
+        settings.inline_debounce,
+    )
+    dp.update.outer_middleware(user_queue)
+    dp.update.outer_middleware(FsmFlushMiddleware(storage))
+    dp.update.outer_middleware(FsmBufferMiddleware())
 
     # Inner middlewares
     dp.message.middleware(DbSessionMiddleware(session_factory))
     dp.callback_query.middleware(DbSessionMiddleware(session_factory))
-    dp.message.middleware(AuthMiddleware())
-    dp.callback_query.middleware(AuthMiddleware())
+    user_cache = UserCache(settings.user_cache_size, settings.user_cache_ttl)
+    dp.message.middleware(AuthMiddleware(session_factory, user_cache))
+    dp.callback_query.middleware(AuthMiddleware(session_factory, user_cache))
     dp.message.middleware(LoggingMiddleware())
     dp.callback_query.middleware(LoggingMiddleware())
+    # Inline queries look up items by the Telegram user id: no AuthMiddleware, nothing is written
+    dp.inline_query.middleware(DbSessionMiddleware(session_factory))
+    dp.inline_query.middleware(LoggingMiddleware())
 
     dp.include_router(errors_router)
     dp.include_router(start_router)
+    # Before callbacks, so /search, /export and /import work in the middle of adding or editing an item
+    dp.include_router(search_router)
+    dp.include_router(export_router)
+    dp.include_router(import_router)
     dp.include_router(callbacks_router)
+    dp.include_router(inline_query_router)
+
+    _register_stats_metrics(user_cache, user_queue, rate_limiter, background_tasks, search_cache, exports, imports)
+    return BotApp(bot, dp, user_cache, user_queue, rate_limiter, background_tasks, search_cache, exports, imports)
 
-    logger.info("Starting bot in %s mode", settings.bot_stage.value)
+
+def _log_stats(app: BotApp) -> None:
+    logger.info(
+        "Main window renders: %d edits, %d sends, %d skipped as unchanged, %d not modified",
+        render_stats.edits,
+        render_stats.sends,
+        render_stats.skipped,
+        render_stats.not_modified,
+    )
+    queue_stats = app.user_queue.stats
+    logger.info(
+        "Updates: %d, %d queued (%.1fs total, %.2fs max, %d queued at most, %d for one user), %d collapsed, "
+        "%d inline queries debounced",
+        queue_stats.updates,
+        queue_stats.waited,
+        queue_stats.wait_total,
+        queue_stats.wait_max,
+        queue_stats.max_queued,
+        queue_stats.max_user_queued,
+        queue_stats.collapsed,
+        queue_stats.debounced,
+    )
+    logger.info(
+        "Inline search cache: %d hits, %d misses, %d invalidations",
+        app.search_cache.hits,
+        app.search_cache.misses,
+        app.search_cache.invalidations,
+    )
+    logger.info(
+        "Exports: %d, %d turned away; imports: %d, %d turned away",
+        app.exports.started,
+        app.exports.rejected,
+        app.imports.started,
+        app.imports.rejected,
+    )
+    if app.rate_limiter is not None:
+        stats = app.rate_limiter.stats
+        logger.info(
+            "Bot API calls: %d, %d held back (%.1fs total, %.2fs max, %d queued at most), "
+            "%d flood errors, %d given up",
+            stats.requests,
+            stats.waited,
+            stats.wait_total,
+            stats.wait_max,
+            stats.max_queued,
+            stats.retry_after,
+            stats.gave_up,
+        )
+
+
+async def main() -> None:
+    settings = get_settings()
+    setup_logging(APP_NAME, update_dump_mode=settings.update_dump_mode)
+
+    setup_sentry(settings.sentry_dsn, settings.bot_stage)
+
+    settings.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+    engine = get_engine()
+    session_factory = get_session_factory(engine)
+
+    await init_db(engine)
+    checkpointer = get_checkpointer(engine, settings)
+    if checkpointer is not None:
+        checkpointer.start()
+
+    app = build_app(settings, engine, session_factory)
+    bot, dp = app.bot, app.dp
+    metrics_runner = None
+    if settings.metrics_port:
+        metrics_runner = await start_metrics_server(settings.metrics_host, settings.metrics_port)
+
+    logger.info("Starting bot in %s mode (%s)", settings.bot_stage.value, settings.bot_run_mode.value)
 
     try:
-        await dp.start_polling(bot)
+        if settings.bot_run_mode == RunMode.WEBHOOK:
+            await run_webhook(dp, bot, settings)
+        else:
+            # getUpdates is refused while a webhook is set, e.g. after switching back from webhook mode
+            await bot.delete_webhook()
+            await dp.start_polling(bot)
     finally:
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
         await bot.session.close()
+        if checkpointer is not None:
+            await checkpointer.stop()
         await engine.dispose()
+        _log_stats(app)
         logger.info("Bot stopped gracefully")
 
 
 def run_main() -> None:
-    with suppress(KeyboardInterrupt, SystemExit):
-        asyncio.run(main())
+    try:
+        with suppress(KeyboardInterrupt, SystemExit):
+            asyncio.run(main())
+    finally:
+        stop_logging()
 
 
 if __name__ == "__main__":
@@ -1,29 +1,60 @@
+import logging
 from collections.abc import Awaitable, Callable
 from typing import Any
 
 from aiogram import BaseMiddleware
 from aiogram.types import TelegramObject
-from sqlalchemy.ext.asyncio import AsyncSession
+from aiogram.types import User as TgUser
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
-from database.crud.user import create_user, get_user
+from bot.internal.user_cache import UserCache
+from database.crud.user import create_user, get_user, update_user
+from database.models import User
+
+logger = logging.getLogger(__name__)
+
+
+def _profile_changed(user: User, tg_user: TgUser) -> bool:
+    return user.fullname != tg_user.full_name or user.username != tg_user.username
 
 
 class AuthMiddleware(BaseMiddleware):
+    """Attaches the User row, served from an in-process cache.
+
+    The database is only touched on a cache miss or when Telegram reports a new name or username.
+    That happens in a short transaction of its own, so a handler's session and its db flag
+    never matter here, and a failing handler does not roll back a user's registration.
+    """
+
+    def __init__(self, session_factory: async_sessionmaker[AsyncSession], cache: UserCache):
+        self.session_factory = session_factory
+        self.cache = cache
+
     async def __call__(
         self,
         handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
         event: TelegramObject,
         data: dict[str, Any],
     ) -> Any:
-        session: AsyncSession = data["session"]
         tg_user = data.get("event_from_user")
 
         if tg_user is None:
             return await handler(event, data)
 
-        user = await get_user(tg_user.id, session)
-        if user is None:
-            user = await create_user(tg_user, session)
+        user = self.cache.get(tg_user.id)
+        if user is None or _profile_changed(user, tg_user):
+            user = await self._sync_user(tg_user)
+            self.cache.put(user)
 
         data["user"] = user
         return await handler(event, data)
+
+    async def _sync_user(self, tg_user: TgUser) -> User:
+        async with self.session_factory.begin() as session:
+            user = await get_user(tg_user.id, session)
+            if user is None:
+                return await create_user(tg_user, session)
+            if _profile_changed(user, tg_user):
+                logger.info("User %s changed profile, updating", tg_user.id)
+                await update_user(user, tg_user, session)
+            return user
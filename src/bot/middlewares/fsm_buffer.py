@@ -0,0 +1,32 @@
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from bot.internal.ui import BufferedFSMContext
+
+
+class FsmBufferMiddleware(BaseMiddleware):
+    """Gives handlers a BufferedFSMContext and commits it once the update is handled.
+
+    Must be registered after aiogram's FSMContextMiddleware, which every Dispatcher installs first.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        context = data.get("state")
+        if context is None:
+            return await handler(event, data)
+
+        buffered = BufferedFSMContext(context, data.get("raw_state"))
+        data["state"] = buffered
+        try:
+            return await handler(event, data)
+        finally:
+            # Changes made before a failure are kept, as they would be without the buffer
+            await buffered.commit()
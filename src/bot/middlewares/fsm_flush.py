@@ -0,0 +1,35 @@
+import logging
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from bot.internal.fsm_storage import SqliteStorage
+
+logger = logging.getLogger(__name__)
+
+
+class FsmFlushMiddleware(BaseMiddleware):
+    """Writes the FSM changes made while handling an update in one go, after the handler.
+
+    A failed write is logged and left to the next flush, which retries the same keys: the handler's
+    result or exception goes through as it was.
+    """
+
+    def __init__(self, storage: SqliteStorage):
+        self.storage = storage
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        try:
+            return await handler(event, data)
+        finally:
+            try:
+                await self.storage.flush()
+            except Exception:
+                logger.exception("Failed to flush FSM storage, will retry on the next update")
@@ -4,13 +4,28 @@ from collections.abc import Awaitable, Callable
 from typing import Any
 
 from aiogram import BaseMiddleware
-from aiogram.types import CallbackQuery, Message, TelegramObject
+from aiogram.filters import CommandObject
+from aiogram.filters.callback_data import CallbackData
+from aiogram.types import CallbackQuery, InlineQuery, Message, TelegramObject
+
+from bot.internal.metrics import handler_errors, handler_seconds
+from database.db import QueryStats
 
 logger = logging.getLogger(__name__)
 
 
+def _action_label(data: dict[str, Any]) -> str:
+    callback_data = data.get("callback_data")
+    if isinstance(callback_data, CallbackData):
+        return f"{callback_data.__prefix__}:{getattr(callback_data, 'action', '')}"
+    command = data.get("command")
+    if isinstance(command, CommandObject):
+        return f"/{command.command}"
+    return ""
+
+
 class LoggingMiddleware(BaseMiddleware):
-    """Logs handler calls with timing."""
+    """Logs handler calls with timing, and records it in the handler metrics."""
 
     async def __call__(
         self,
@@ -26,12 +41,35 @@ class LoggingMiddleware(BaseMiddleware):
             event_info = f"message: {event.text[:30] if event.text else '[no text]'!r}"
         elif isinstance(event, CallbackQuery):
             event_info = f"callback: {event.data}"
+        elif isinstance(event, InlineQuery):
+            event_info = f"inline query: {event.query[:30]!r}"
         else:
             event_info = f"{type(event).__name__}"
 
-        result = await handler(event, data)
+        handler_object = data.get("handler")
+        labels = (handler_object.callback.__name__ if handler_object else "?", _action_label(data))
+        query_stats: QueryStats | None = data.get("query_stats")
+        if query_stats is not None:
+            query_stats.handler = labels[0]
+        try:
+            result = await handler(event, data)
+        except Exception:
+            handler_errors.inc(*labels)
+            raise
+        finally:
+            handler_seconds.observe(time.perf_counter() - start, *labels)
 
         elapsed = (time.perf_counter() - start) * 1000
-        logger.info("%s | %s | %.1fms", user_info, event_info, elapsed)
+        if query_stats is not None:
+            logger.info(
+                "%s | %s | %.1fms | %d queries, %.1fms db",
+                user_info,
+                event_info,
+                elapsed,
+                query_stats.queries,
+                query_stats.seconds * 1000,
+            )
+        else:
+            logger.info("%s | %s | %.1fms", user_info, event_info, elapsed)
 
         return result
@@ -0,0 +1,36 @@
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+from bot.internal.metrics import update_db_seconds, update_queries, update_seconds, updates_in_flight
+from database.db import QueryStats, query_stats
+
+
+class MetricsMiddleware(BaseMiddleware):
+    """Tracks updates in flight, and the time and database queries each update takes.
+
+    The update's QueryStats is also put in the context data as "query_stats".
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: dict[str, Any],
+    ) -> Any:
+        # Named after the update type until the handler is known
+        stats = data["query_stats"] = QueryStats(handler=f"<{event.event_type}>")
+        token = query_stats.set(stats)
+        updates_in_flight.inc()
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            update_seconds.observe(time.perf_counter() - start, event.event_type)
+            update_queries.observe(stats.queries)
+            update_db_seconds.observe(stats.seconds)
+            updates_in_flight.dec()
+            query_stats.reset(token)
@@ -0,0 +1,144 @@
+import asyncio
+import logging
+import time
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import AnswerCallbackQuery, Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+
+logger = logging.getLogger(__name__)
+
+# Served ahead of everything else: the user is looking at a spinner until it goes out
+PRIORITY_METHODS = (AnswerCallbackQuery,)
+
+
+class TokenBucket:
+    """Token bucket handing out reservations: take() returns how long to wait for the token.
+
+    Tokens may go negative, which queues callers in arrival order without keeping a queue.
+    """
+
+    __slots__ = ("burst", "paused_until", "rate", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, now: float, *, priority: bool = False) -> float:
+        self._refill(now)
+        self.tokens -= 1
+        # A priority call jumps the line: it only waits out a flood pause, the others absorb its token
+        wait = 0.0 if priority or self.tokens >= 0 else -self.tokens / self.rate
+        return max(wait, self.paused_until - now)
+
+    def pause(self, until: float) -> None:
+        self.paused_until = max(self.paused_until, until)
+
+    def is_idle(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.burst and now >= self.paused_until
+
+
+class RateLimitStats:
+    """Counters of outbound Bot API calls held back by the rate limiter."""
+
+    def __init__(self):
+        self.requests = 0
+        # Calls sleeping for a token right now, and the most there ever were
+        self.queued = 0
+        self.max_queued = 0
+        self.waited = 0
+        self.wait_total = 0.0  # seconds
+        self.wait_max = 0.0
+        # 429 responses, and calls given up on after max_retries of them
+        self.retry_after = 0
+        self.gave_up = 0
+
+
+class RateLimitMiddleware(BaseRequestMiddleware):
+    """Bot session middleware keeping outbound calls under Telegram's flood limits.
+
+    Every call takes a token from a global bucket, calls addressed to a chat also take one from
+    that chat's bucket. A 429 pauses the chat (or everything, for calls without a chat) for
+    retry_after seconds, and the call is retried up to max_retries times.
+    """
+
+    def __init__(self, rate: float, chat_rate: float, chat_burst: int, max_retries: int = 2):
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self.stats = RateLimitStats()
+        self._global = TokenBucket(rate, max(1, int(rate)))
+        self._chats: dict[int | str, TokenBucket] = {}
+        self._next_prune = time.monotonic() + 60
+
+    def _chat_bucket(self, chat_id: int | str) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            bucket = self._chats[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket
+
+    def _prune(self, now: float) -> None:
+        # A full bucket is the same as a new one
+        for chat_id in [chat_id for chat_id, bucket in self._chats.items() if bucket.is_idle(now)]:
+            del self._chats[chat_id]
+        self._next_prune = now + 60
+
+    async def _acquire(self, chat_id: int | str | None, priority: bool) -> None:
+        now = time.monotonic()
+        if now >= self._next_prune:
+            self._prune(now)
+        wait = self._global.take(now, priority=priority)
+        if chat_id is not None:
+            wait = max(wait, self._chat_bucket(chat_id).take(now, priority=priority))
+        if wait <= 0:
+            return
+
+        stats = self.stats
+        stats.queued += 1
+        stats.max_queued = max(stats.max_queued, stats.queued)
+        try:
+            await asyncio.sleep(wait)
+        finally:
+            stats.queued -= 1
+        stats.waited += 1
+        stats.wait_total += wait
+        stats.wait_max = max(stats.wait_max, wait)
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        chat_id = getattr(method, "chat_id", None)
+        priority = isinstance(method, PRIORITY_METHODS)
+        self.stats.requests += 1
+        attempt = 0
+        while True:
+            await self._acquire(chat_id, priority)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                self.stats.retry_after += 1
+                bucket = self._global if chat_id is None else self._chat_bucket(chat_id)
+                bucket.pause(time.monotonic() + e.retry_after)
+                if attempt >= self.max_retries:
+                    self.stats.gave_up += 1
+                    raise
+                attempt += 1
+                logger.warning(
+                    "Flood control on %s (chat %s), retrying in %ds",
+                    method.__api_method__,
+                    chat_id,
+                    e.retry_after,
+                )
@@ -2,9 +2,17 @@ from collections.abc import Awaitable, Callable
 from typing import Any
 
 from aiogram import BaseMiddleware
+from aiogram.dispatcher.flags import get_flag
 from aiogram.types import TelegramObject
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
+from bot.enums import DbAccess
+
+
+def get_db_access(data: dict[str, Any]) -> DbAccess:
+    """Access level declared by the handler with flags={"db": ...}; read-write if not declared."""
+    return DbAccess(get_flag(data, "db", default=DbAccess.WRITE))
+
 
 class DbSessionMiddleware(BaseMiddleware):
     def __init__(self, session_factory: async_sessionmaker[AsyncSession]):
@@ -16,6 +24,16 @@ class DbSessionMiddleware(BaseMiddleware):
         event: TelegramObject,
         data: dict[str, Any],
     ) -> Any:
+        access = get_db_access(data)
+        if access == DbAccess.NONE:
+            return await handler(event, data)
+
+        if access == DbAccess.READ:
+            # No transaction: the session checks out a connection on first query and never commits
+            async with self.session_factory() as session:
+                data["session"] = session
+                return await handler(event, data)
+
         async with self.session_factory() as session, session.begin():
             data["session"] = session
             return await handler(event, data)
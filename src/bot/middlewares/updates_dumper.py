@@ -1,4 +1,5 @@
 import logging
+import random
 from collections.abc import Awaitable, Callable
 from typing import Any
 
@@ -6,11 +7,39 @@ from aiogram import BaseMiddleware
 from aiogram.dispatcher.event.bases import UNHANDLED
 from aiogram.types import TelegramObject, Update
 
+from bot.enums import UpdateDumpMode
+from bot.internal.logging_config import UPDATES_LOGGER
+
 logger = logging.getLogger(__name__)
+dump_logger = logging.getLogger(UPDATES_LOGGER)
 
 
 class UpdatesDumperMiddleware(BaseMiddleware):
-    """Logs all incoming updates as JSON. Use in dev mode only."""
+    """Dumps incoming updates as JSON to the updates log, and warns about updates no handler took.
+
+    In SAMPLE mode a sample_percent share of updates is dumped as it comes in, in FAILED mode
+    only updates that went unhandled or raised are. Payloads are cut to max_chars.
+    """
+
+    def __init__(
+        self,
+        mode: UpdateDumpMode = UpdateDumpMode.FAILED,
+        sample_percent: float = 100.0,
+        max_chars: int = 4096,
+    ):
+        self.mode = mode
+        self.sample_percent = sample_percent
+        self.max_chars = max_chars
+
+    def _dump(self, event: Update, reason: str) -> None:
+        # Serializing is most of the cost, don't do it for a record the logger would drop: setup_logging()
+        # sets its level from the dump mode
+        if not dump_logger.isEnabledFor(logging.DEBUG):
+            return
+        payload = event.model_dump_json(exclude_unset=True)
+        if len(payload) > self.max_chars:
+            payload = f"{payload[: self.max_chars]}... [{len(payload)} chars]"
+        dump_logger.debug("%s %s %s", reason, event.update_id, payload)
 
     async def __call__(
         self,
@@ -18,8 +47,18 @@ class UpdatesDumperMiddleware(BaseMiddleware):
         event: Update,
         data: dict[str, Any],
     ) -> Any:
-        logger.debug(event.model_dump_json(exclude_unset=True))
-        result = await handler(event, data)
+        if self.mode == UpdateDumpMode.SAMPLE and random.random() * 100 < self.sample_percent:
+            self._dump(event, "sampled")
+
+        try:
+            result = await handler(event, data)
+        except Exception:
+            if self.mode == UpdateDumpMode.FAILED:
+                self._dump(event, "failed")
+            raise
+
         if result is UNHANDLED:
             logger.warning("Update not handled: %s", event.update_id)
+            if self.mode == UpdateDumpMode.FAILED:
+                self._dump(event, "unhandled")
         return result
@@ -0,0 +1,152 @@
+import asyncio
+import itertools
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update, User
+
+logger = logging.getLogger(__name__)
+
+
+class UserQueueStats:
+    """Counters of updates held back by UserQueueMiddleware."""
+
+    def __init__(self):
+        self.updates = 0
+        # Updates waiting for their user's previous update or a free slot, and the most there ever were
+        self.queued = 0
+        self.max_queued = 0
+        self.max_user_queued = 0
+        self.waited = 0
+        self.wait_total = 0.0  # seconds
+        self.wait_max = 0.0
+        # Navigation taps dropped because a newer one from the same user was waiting behind them
+        self.collapsed = 0
+        # Inline queries dropped because the user typed on within the debounce delay
+        self.debounced = 0
+
+
+class _UserSlot:
+    __slots__ = ("latest_inline", "latest_navigation", "lock", "users")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        # Updates holding or waiting for the lock, the slot is dropped when it gets back to 0
+        self.users = 0
+        self.latest_navigation = 0
+        self.latest_inline = 0
+
+
+class UserQueueMiddleware(BaseMiddleware):
+    """Handles one update per user at a time, and at most max_concurrency updates overall.
+
+    A user's updates run in arrival order, so fast taps can't race on the main window or on the
+    same item. The global limit is only taken once it is the update's turn, so a user with a
+    long queue holds one slot at most. With is_navigation set, a navigation callback still
+    waiting when a newer one from the same user arrives is answered and dropped.
+
+    Inline queries change nothing and come with every keystroke: they skip the user's queue, wait
+    inline_debounce seconds instead and are dropped if the user typed on in the meantime.
+
+    Must run before the FSM middlewares: the state resolved by the dispatcher before the wait
+    is re-read once the update gets its turn.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        is_navigation: Callable[[str], bool] | None = None,
+        inline_debounce: float = 0.0,
+    ):
+        self.is_navigation = is_navigation
+        self.inline_debounce = inline_debounce
+        self.stats = UserQueueStats()
+        self._slots: dict[int, _UserSlot] = {}
+        self._limit = asyncio.Semaphore(max_concurrency)
+        self._seq = itertools.count(1)
+
+    def _navigation_seq(self, event: Update) -> int | None:
+        callback = event.callback_query
+        if self.is_navigation is None or callback is None or not callback.data:
+            return None
+        return next(self._seq) if self.is_navigation(callback.data) else None
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: dict[str, Any],
+    ) -> Any:
+        user: User | None = data.get("event_from_user")
+        stats = self.stats
+        stats.updates += 1
+        if user is None:
+            async with self._limit:
+                return await handler(event, data)
+
+        slot = self._slots.get(user.id)
+        if slot is None:
+            slot = self._slots[user.id] = _UserSlot()
+        if event.inline_query is not None:
+            return await self._inline_query(handler, event, data, user.id, slot)
+        navigation = self._navigation_seq(event)
+        if navigation is not None:
+            slot.latest_navigation = navigation
+
+        slot.users += 1
+        contended = slot.lock.locked() or self._limit.locked()
+        if contended:
+            stats.queued += 1
+            stats.max_queued = max(stats.max_queued, stats.queued)
+            stats.max_user_queued = max(stats.max_user_queued, slot.users - 1)
+        start = time.monotonic()
+        try:
+            async with slot.lock:
+                if navigation is not None and navigation != slot.latest_navigation:
+                    stats.collapsed += 1
+                    return event.callback_query.answer()
+                async with self._limit:
+                    if contended:
+                        stats.queued -= 1
+                        contended = False
+                        waited = time.monotonic() - start
+                        stats.waited += 1
+                        stats.wait_total += waited
+                        stats.wait_max = max(stats.wait_max, waited)
+                        if (state := data.get("state")) is not None:
+                            # The update ahead of this one may have moved the user to another state
+                            data["raw_state"] = await state.get_state()
+                    return await handler(event, data)
+        finally:
+            if contended:
+                stats.queued -= 1
+            self._release(user.id, slot)
+
+    def _release(self, user_id: int, slot: _UserSlot) -> None:
+        slot.users -= 1
+        if slot.users == 0:
+            del self._slots[user_id]
+
+    async def _inline_query(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: dict[str, Any],
+        user_id: int,
+        slot: _UserSlot,
+    ) -> Any:
+        seq = slot.latest_inline = next(self._seq)
+        slot.users += 1
+        try:
+            if self.inline_debounce > 0:
+                await asyncio.sleep(self.inline_debounce)
+                if seq != slot.latest_inline:
+                    self.stats.debounced += 1
+                    return None
+        finally:
+            self._release(user_id, slot)
+        async with self._limit:
+            return await handler(event, data)
@@ -0,0 +1,35 @@
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.enums import Category, ItemStatus
+from database.models import ItemCounter, item_counts_query
+
+CounterKey = tuple[int, Category, ItemStatus, int]
+
+
+async def rebuild_item_counters(session: AsyncSession) -> int:
+    """Recompute item_counters from items. Returns the number of counter rows written."""
+    await session.execute(delete(ItemCounter))
+    result = await session.execute(
+        insert(ItemCounter).from_select(
+            [ItemCounter.user_id, ItemCounter.category, ItemCounter.status, ItemCounter.year, ItemCounter.count],
+            item_counts_query(),
+        )
+    )
+    return result.rowcount
+
+
+async def verify_item_counters(session: AsyncSession) -> dict[CounterKey, tuple[int, int]]:
+    """Compare item_counters with items. Returns {key: (stored, actual)} for every mismatch."""
+    actual = {(u, c, s, int(y)): n for u, c, s, y, n in await session.execute(item_counts_query())}
+    stored = {
+        (u, c, s, y): n
+        for u, c, s, y, n in await session.execute(
+            select(ItemCounter.user_id, ItemCounter.category, ItemCounter.status, ItemCounter.year, ItemCounter.count)
+        )
+    }
+    return {
+        key: (stored.get(key, 0), actual.get(key, 0))
+        for key in stored.keys() | actual.keys()
+        if stored.get(key, 0) != actual.get(key, 0)
+    }
@@ -1,11 +1,88 @@
-from sqlalchemy import distinct, extract, func, select
+import re
+import unicodedata
+from collections.abc import AsyncIterator, Collection, Sequence
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+from typing import NamedTuple, Self
+
+from sqlalchemy import Row, String, bindparam, exists, func, insert, literal_column, or_, select, tuple_, type_coerce
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from bot.enums import Category, ItemStatus
-from database.models import Item
+from database.models import ITEMS_FTS, SEARCH_PREFIX_LENGTHS, Item, ItemCounter, items_fts, title_key
 
 PAGE_SIZE = 20
 MAX_TITLE_LENGTH = 100
+SEARCH_LIMIT = 20
+MAX_SEARCH_TERMS = 8
+SEARCH_CANDIDATES = 200
+# Older whole word matches ranked along with the newest matches, see search_items
+SEARCH_WORD_CANDIDATES = 20
+STREAM_BATCH = 500
+
+# Runs of letters and digits, roughly the tokens unicode61 splits text into
+_WORD = re.compile(r"[^\W_]+")
+# Session.info key: users whose items the session changed, for caches of them (see SearchCache)
+CHANGED_ITEM_USERS = "changed_item_users"
+
+
+class PageCursor(NamedTuple):
+    """Position in an item list, which is ordered by (created_at, id) descending.
+
+    A forward cursor selects items at or after the position, so it names a page by its first item
+    and keeps working after that item is logged or deleted. A backward cursor selects the items
+    right before the position.
+    """
+
+    created_at: datetime
+    item_id: int
+    backward: bool = False
+
+    @classmethod
+    def of(cls, item: Item, *, backward: bool = False) -> Self:
+        return cls(item.created_at, item.id, backward)
+
+    def pack(self) -> str:
+        """Compact form for callback data: "<unix ts>.<id>", with a "b" suffix for backward cursors."""
+        ts = int(self.created_at.replace(tzinfo=UTC).timestamp())
+        return f"{ts}.{self.item_id}{'b' if self.backward else ''}"
+
+    @classmethod
+    def unpack(cls, value: str | None) -> Self | None:
+        if not value:
+            return None
+        backward = value.endswith("b")
+        ts, item_id = value.removesuffix("b").split(".")
+        created_at = datetime.fromtimestamp(int(ts), UTC).replace(tzinfo=None)
+        return cls(created_at, int(item_id), backward)
+
+    @property
+    def key(self) -> tuple[str, int]:
+        # created_at is stored as "YYYY-MM-DD HH:MM:SS" text (server default); comparing against the
+        # same text keeps the bound value out of the column's NUMERIC affinity and the range on the index
+        return self.created_at.strftime("%Y-%m-%d %H:%M:%S"), self.item_id
+
+
+class NewItem(NamedTuple):
+    title: str
+    category: Category
+    status: ItemStatus = ItemStatus.BACKLOG
+    created_at: datetime | None = None  # the time of insert if None
+
+
+class ItemsPage(NamedTuple):
+    items: list[Item]
+    cursor: PageCursor | None
+    prev: PageCursor | None
+    next: PageCursor | None
+
+
+def _items_changed(session: AsyncSession, user_id: int) -> None:
+    session.info.setdefault(CHANGED_ITEM_USERS, set()).add(user_id)
+
+
+def _sort_key():
+    return tuple_(type_coerce(Item.created_at, String), Item.id)
 
 
 async def create_item(
@@ -19,35 +96,149 @@ async def create_item(
     item = Item(
         user_id=user_id,
         title=title,
+        title_key=title_key(title),
         category=category,
         status=status,
     )
     session.add(item)
     await session.flush()
+    _items_changed(session, user_id)
     return item
 
 
+# One statement for any number of rows, executed with executemany. created_at is bound as text in
+# the server default's format (see PageCursor.key), the DateTime type would add microseconds
+_INSERT_ITEMS = insert(Item).values(
+    user_id=bindparam("user_id"),
+    title=bindparam("title"),
+    title_key=bindparam("title_key"),
+    category=bindparam("category"),
+    status=bindparam("status"),
+    created_at=func.coalesce(bindparam("created_at", type_=String), func.now()),
+)
+
+
+async def create_items(user_id: int, items: Sequence[NewItem], session: AsyncSession) -> int:
+    """Insert many items in one executemany INSERT, without loading them back as ORM objects.
+
+    The counter and search triggers fire for every row, as they do for create_item.
+    """
+    if not items:
+        return 0
+    await session.execute(
+        _INSERT_ITEMS,
+        [
+            {
+                "user_id": user_id,
+                "title": item.title,
+                "title_key": title_key(item.title),
+                "category": item.category,
+                "status": item.status,
+                "created_at": item.created_at.strftime("%Y-%m-%d %H:%M:%S") if item.created_at else None,
+            }
+            for item in items
+        ],
+    )
+    _items_changed(session, user_id)
+    return len(items)
+
+
+def item_key(category: Category, title: str) -> str:
+    """What duplicate items have in common: the category and the title_key."""
+    return f"{category.value}:{title_key(title)}"
+
+
+async def get_item_keys(user_id: int, session: AsyncSession) -> set[str]:
+    """item_key of every item of the user, read STREAM_BATCH rows at a time.
+
+    Plain strings: a set of a heavy user's keys is no work for the garbage collector, unlike tuples.
+    """
+    result = await session.stream(
+        select(Item.category, Item.title_key).where(Item.user_id == user_id).execution_options(yield_per=STREAM_BATCH)
+    )
+    return {f"{category.value}:{key}" async for rows in result.partitions() for category, key in rows}
+
+
+async def get_title_keys(user_id: int, category: Category, keys: Collection[str], session: AsyncSession) -> set[str]:
+    """Those of keys (title_key values) that the user's items in category have, by index lookups.
+
+    Compared by title_key rather than looked up in items_fts: its tokenizer folds titles its own
+    way, so it can't find every title title_key takes for the same.
+    """
+    if not keys:
+        return set()
+    result = await session.execute(
+        select(Item.title_key)
+        .where(Item.user_id == user_id, Item.category == category, Item.title_key.in_(keys))
+        .distinct()
+    )
+    return set(result.scalars())
+
+
 async def get_item(item_id: int, session: AsyncSession) -> Item | None:
     result = await session.execute(select(Item).where(Item.id == item_id))
     return result.scalar_one_or_none()
 
 
-async def get_items(
+async def get_items_page(
     user_id: int,
     category: Category,
     status: ItemStatus,
     session: AsyncSession,
     *,
-    page: int = 0,
-) -> list[Item]:
-    result = await session.execute(
-        select(Item)
-        .where(Item.user_id == user_id, Item.category == category, Item.status == status)
-        .order_by(Item.created_at.desc())
-        .offset(page * PAGE_SIZE)
-        .limit(PAGE_SIZE)
+    cursor: PageCursor | None = None,
+) -> ItemsPage:
+    """Keyset pagination: every page is an index seek on (created_at, id), however deep it is."""
+    filters = (Item.user_id == user_id, Item.category == category, Item.status == status)
+    sort_key = _sort_key()
+    newest_first = (Item.created_at.desc(), Item.id.desc())
+
+    if cursor is not None and cursor.backward:
+        result = await session.execute(
+            select(Item)
+            .where(*filters, sort_key > cursor.key)
+            .order_by(Item.created_at.asc(), Item.id.asc())
+            .limit(PAGE_SIZE + 1)
+        )
+        rows = list(result.scalars().all())
+        if len(rows) > PAGE_SIZE:
+            items = rows[:PAGE_SIZE][::-1]
+            result = await session.execute(
+                select(Item.created_at, Item.id)
+                .where(*filters, sort_key < PageCursor.of(items[-1]).key)
+                .order_by(*newest_first)
+                .limit(1)
+            )
+            following = result.first()
+            return ItemsPage(
+                items,
+                PageCursor.of(items[0]),
+                PageCursor.of(items[0], backward=True),
+                PageCursor(*following) if following else None,
+            )
+        # Less than a page before the cursor: that is the first page
+        cursor = None
+
+    query = select(Item).where(*filters).order_by(*newest_first).limit(PAGE_SIZE + 1)
+    if cursor is not None:
+        query = query.where(sort_key <= cursor.key)
+    result = await session.execute(query)
+    rows = list(result.scalars().all())
+    if cursor is not None and not rows:
+        # Everything from the cursor on is gone, show the page before it instead
+        return await get_items_page(user_id, category, status, session, cursor=cursor._replace(backward=True))
+
+    items = rows[:PAGE_SIZE]
+    has_prev = False
+    if cursor is not None:
+        result = await session.execute(select(exists().where(*filters, sort_key > PageCursor.of(items[0]).key)))
+        has_prev = result.scalar_one()
+    return ItemsPage(
+        items,
+        PageCursor.of(items[0]) if has_prev else None,
+        PageCursor.of(items[0], backward=True) if has_prev else None,
+        PageCursor.of(rows[PAGE_SIZE]) if len(rows) > PAGE_SIZE else None,
     )
-    return list(result.scalars().all())
 
 
 async def get_items_count(
@@ -57,10 +248,10 @@ async def get_items_count(
     session: AsyncSession,
 ) -> int:
     result = await session.execute(
-        select(func.count(Item.id)).where(
-            Item.user_id == user_id,
-            Item.category == category,
-            Item.status == status,
+        select(func.coalesce(func.sum(ItemCounter.count), 0)).where(
+            ItemCounter.user_id == user_id,
+            ItemCounter.category == category,
+            ItemCounter.status == status,
         )
     )
     return result.scalar_one()
@@ -71,6 +262,7 @@ async def log_item(item_id: int, session: AsyncSession) -> Item | None:
     if item:
         item.status = ItemStatus.LOGGED
         await session.flush()
+        _items_changed(session, item.user_id)
     return item
 
 
@@ -78,7 +270,9 @@ async def update_item_title(item_id: int, title: str, session: AsyncSession) ->
     item = await get_item(item_id, session)
     if item:
         item.title = title
+        item.title_key = title_key(title)
         await session.flush()
+        _items_changed(session, item.user_id)
     return item
 
 
@@ -87,54 +281,158 @@ async def delete_item(item_id: int, session: AsyncSession) -> bool:
     if item:
         await session.delete(item)
         await session.flush()
+        _items_changed(session, item.user_id)
         return True
     return False
 
 
-# Statistics
-async def get_stats(user_id: int, session: AsyncSession, year: int | None = None) -> dict:
-    """Get user statistics by category."""
-    stats = {}
-    for cat in Category:
-        query = select(func.count(Item.id)).where(
-            Item.user_id == user_id,
-            Item.category == cat,
-            Item.status == ItemStatus.LOGGED,
-        )
-        if year:
-            query = query.where(extract("year", Item.created_at) == year)
+def search_terms(text: str) -> list[str]:
+    """The words of text as typed, split on whitespace only.
 
-        result = await session.execute(query)
-        stats[cat] = result.scalar_one()
+    They are left for the items_fts tokenizer to fold and split, like the titles it indexed:
+    unicode61 folds case and diacritics from its own Unicode tables, which no Python normalization
+    matches. casefold() would turn "Straße" into "strasse" and NFKD "ﬁnal" into "final", neither
+    of which is in the index.
+    """
+    return text.split()
 
-    return stats
 
+def _quoted(term: str) -> str:
+    # An FTS5 string: nothing in it is taken for query syntax, and the tokenizer splits it into a phrase
+    return '"' + term.replace('"', '""') + '"'
 
-async def get_total_stats(user_id: int, session: AsyncSession) -> dict:
-    """Get total counts for backlog and logged."""
-    backlog = await session.execute(
-        select(func.count(Item.id)).where(
-            Item.user_id == user_id,
-            Item.status == ItemStatus.BACKLOG,
-        )
+
+def search_query(user_id: int, terms: list[str], *, prefix: bool = True) -> str | None:
+    """FTS5 query for the user's items with each of the terms as a word, the last one as the start of one.
+
+    The terms before the last are complete words, the user typed past them. A last term ending in a
+    single letter is left out: as a prefix it would match most of the index, and while typing
+    "dune m" the items matching "dune" are what the user wants to see. With prefix=False the last
+    term has to be a whole word too. None if no term is left.
+    """
+    terms = [term for term in terms if _WORD.search(term)]
+    phrases = [_quoted(term) for term in terms]
+    if terms and len(_WORD.findall(terms[-1])[-1]) < SEARCH_PREFIX_LENGTHS.start:
+        phrases.pop()
+    elif phrases and prefix:
+        phrases[-1] += "*"
+    return f'user_id:"{user_id}" AND title:({" ".join(phrases)})' if phrases else None
+
+
+def _rank_words(text: str) -> list[str]:
+    # Only orders the items FTS5 has found, where folding a little unlike its tokenizer does no harm
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    return _WORD.findall("".join(char for char in decomposed if not unicodedata.combining(char)))
+
+
+def _search_rank(item: Item, terms: list[str]) -> tuple[int, int, int, int, int]:
+    words = _rank_words(item.title)
+    prefix_hits = sum(any(word.startswith(term) for word in words) for term in terms)
+    whole_words = sum(term in words for term in terms)
+    first_hit = next((n for n, word in enumerate(words) if word.startswith(tuple(terms))), len(words))
+    return -prefix_hits, -whole_words, first_hit, len(words), -item.id
+
+
+def _newest_matches(query: str, limit: int):
+    # In rowid order FTS5 reads no more of the index than it returns
+    return (
+        select(items_fts.c.rowid)
+        .where(literal_column(ITEMS_FTS).op("MATCH")(query))
+        .order_by(items_fts.c.rowid.desc())
+        .limit(limit)
     )
-    logged = await session.execute(
-        select(func.count(Item.id)).where(
-            Item.user_id == user_id,
-            Item.status == ItemStatus.LOGGED,
+
+
+async def search_items(user_id: int, text: str, session: AsyncSession, *, limit: int = SEARCH_LIMIT) -> list[Item]:
+    """The user's items matching text across categories and statuses, closest first.
+
+    Only the newest SEARCH_CANDIDATES matches and the newest SEARCH_WORD_CANDIDATES matching the
+    last term as a whole word are ranked, here: most terms matched first (single letters count
+    only here), then whole word matches, matches early in the title, shorter titles and newer
+    items. An old title typed out in full is found however many newer ones start with it, an old
+    prefix match can be left out. Ranking every match with bm25 instead takes 10-100 ms for a user
+    with 150k items, on every inline keystroke.
+    """
+    terms = search_terms(text)[:MAX_SEARCH_TERMS]
+    query = search_query(user_id, terms)
+    if query is None:
+        return []
+    candidates = [_newest_matches(query, SEARCH_CANDIDATES)]
+    if (word_query := search_query(user_id, terms, prefix=False)) != query:
+        candidates.append(_newest_matches(word_query, SEARCH_WORD_CANDIDATES))
+    result = await session.execute(select(Item).where(or_(*(Item.id.in_(ids) for ids in candidates))))
+    rank_terms = _rank_words(" ".join(terms))
+    items = sorted(result.scalars().all(), key=lambda item: _search_rank(item, rank_terms))
+    return items[:limit]
+
+
+async def stream_items(
+    user_id: int,
+    session: AsyncSession,
+    *,
+    category: Category | None = None,
+    status: ItemStatus | None = None,
+    year: int | None = None,
+) -> AsyncIterator[Sequence[Row]]:
+    """The user's items as (id, title, category, status, created_at) rows, STREAM_BATCH at a time.
+
+    Read through a server-side cursor, so only one batch is held in memory however many items there
+    are. Ordered like ix_items_user_category_status_created: SQLite walks the index instead of
+    sorting every matching row before returning the first.
+    """
+    query = select(Item.id, Item.title, Item.category, Item.status, Item.created_at).where(Item.user_id == user_id)
+    if category is not None:
+        query = query.where(Item.category == category)
+    if status is not None:
+        query = query.where(Item.status == status)
+    if year is not None:
+        # Text bounds, like PageCursor.key, so the range stays on the index
+        created_at = type_coerce(Item.created_at, String)
+        query = query.where(created_at >= f"{year:04d}-01-01", created_at < f"{year + 1:04d}-01-01")
+    query = query.order_by(Item.category, Item.status, Item.created_at, Item.id)
+    result = await session.stream(query.execution_options(yield_per=STREAM_BATCH))
+    async for rows in result.partitions():
+        yield rows
+
+
+# Statistics
+CountKey = tuple[Category, ItemStatus, int]
+
+
+@dataclass(frozen=True, slots=True)
+class ItemCounts:
+    """Item counts of one user broken down by (category, status, year)."""
+
+    counts: dict[CountKey, int] = field(default_factory=dict)
+
+    def count(
+        self,
+        category: Category | None = None,
+        status: ItemStatus | None = None,
+        year: int | None = None,
+    ) -> int:
+        """Sum of the counts matching the given filters; None matches anything."""
+        return sum(
+            n
+            for (cat, st, yr), n in self.counts.items()
+            if (category is None or cat == category)
+            and (status is None or st == status)
+            and (year is None or yr == year)
         )
-    )
-    return {
-        "backlog": backlog.scalar_one(),
-        "logged": logged.scalar_one(),
-    }
 
+    def by_category(self, status: ItemStatus, year: int | None = None) -> dict[Category, int]:
+        return {cat: self.count(cat, status, year) for cat in Category}
+
+    def years(self, status: ItemStatus) -> list[int]:
+        """Years with items in the given status, sorted descending."""
+        return sorted({yr for (_, st, yr), n in self.counts.items() if st == status and n}, reverse=True)
 
-async def get_logged_years(user_id: int, session: AsyncSession) -> list[int]:
-    """Get list of years with logged items, sorted descending."""
+
+async def get_item_counts(user_id: int, session: AsyncSession) -> ItemCounts:
+    """Get all of the user's counts in a single primary key range read of item_counters."""
     result = await session.execute(
-        select(distinct(extract("year", Item.created_at)))
-        .where(Item.user_id == user_id, Item.status == ItemStatus.LOGGED)
-        .order_by(extract("year", Item.created_at).desc())
+        select(ItemCounter.category, ItemCounter.status, ItemCounter.year, ItemCounter.count).where(
+            ItemCounter.user_id == user_id
+        )
     )
-    return [int(year) for year in result.scalars().all()]
+    return ItemCounts({(category, status, year): n for category, status, year, n in result.all()})
@@ -19,3 +19,10 @@ async def create_user(tg_user: TgUser, session: AsyncSession) -> User:
     session.add(user)
     await session.flush()
     return user
+
+
+async def update_user(user: User, tg_user: TgUser, session: AsyncSession) -> User:
+    user.fullname = tg_user.full_name
+    user.username = tg_user.username
+    await session.flush()
+    return user
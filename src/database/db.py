@@ -1,25 +1,138 @@
+import asyncio
+import logging
+import time
+from collections.abc import Mapping
+from contextlib import suppress
+from contextvars import ContextVar
+from dataclasses import dataclass
+
 from sqlalchemy import event
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+
+from bot.config import Settings, get_settings
+from bot.enums import CheckpointMode, JournalMode
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class QueryStats:
+    queries: int = 0
+    seconds: float = 0.0
+    # Where the update is at, for the slow query log
+    handler: str | None = None
+
+
+# Set per update (see MetricsMiddleware); queries made outside of one aren't counted
+query_stats: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+
+
+def _row_shape(row) -> str:
+    if isinstance(row, Mapping):
+        return "{" + ", ".join(f"{key}: {type(value).__name__}" for key, value in row.items()) + "}"
+    return "(" + ", ".join(type(value).__name__ for value in row) + ")"
+
+
+def _parameters_shape(parameters, executemany: bool) -> str:
+    """Types of the bound parameters, not their values: those may be user data."""
+    if executemany:
+        return f"{len(parameters)} x {_row_shape(parameters[0]) if parameters else '()'}"
+    return _row_shape(parameters)
+
 
-from bot.config import get_settings
+def _track_queries(engine, slow_query_seconds: float) -> None:
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info["query_start"] = time.perf_counter()
 
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info.pop("query_start")
+        stats = query_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.seconds += elapsed
+        if 0 < slow_query_seconds <= elapsed:
+            logger.warning(
+                "Slow query: %.1fms in %s: %s | parameters: %s",
+                elapsed * 1000,
+                stats.handler if stats is not None else "-",
+                " ".join(statement.split()),
+                _parameters_shape(parameters, executemany),
+            )
 
-def get_engine():
-    settings = get_settings()
+
+def get_engine(settings: Settings | None = None):
+    settings = settings or get_settings()
     engine = create_async_engine(settings.db_url, echo=False)
 
     @event.listens_for(engine.sync_engine, "connect")
     def set_sqlite_pragma(dbapi_connection, _):
         cursor = dbapi_connection.cursor()
-        cursor.execute("PRAGMA journal_mode=DELETE")
-        cursor.execute("PRAGMA synchronous=FULL")
-        cursor.execute("PRAGMA busy_timeout=5000")
-        cursor.execute("PRAGMA cache_size=-64000")
+        cursor.execute(f"PRAGMA journal_mode={settings.db_journal_mode}")
+        cursor.execute(f"PRAGMA synchronous={settings.db_synchronous}")
+        cursor.execute(f"PRAGMA busy_timeout={settings.db_busy_timeout:d}")
+        cursor.execute(f"PRAGMA cache_size={settings.db_cache_size:d}")
+        cursor.execute(f"PRAGMA mmap_size={settings.db_mmap_size:d}")
+        if settings.db_journal_mode == JournalMode.WAL:
+            cursor.execute(f"PRAGMA wal_autocheckpoint={settings.db_wal_autocheckpoint:d}")
         cursor.execute("PRAGMA foreign_keys=ON")
         cursor.close()
 
+    _track_queries(engine, settings.db_slow_query_ms / 1000)
     return engine
 
 
 def get_session_factory(engine) -> async_sessionmaker[AsyncSession]:
     return async_sessionmaker(engine, expire_on_commit=False)
+
+
+class WalCheckpointer:
+    """Runs PRAGMA wal_checkpoint periodically in the background.
+
+    stop() lets a checkpoint that is already running finish instead of cancelling it mid-statement.
+    """
+
+    def __init__(self, engine: AsyncEngine, interval: float, mode: CheckpointMode = CheckpointMode.PASSIVE):
+        self.engine = engine
+        self.interval = interval
+        self.mode = mode
+        self._stopping = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="wal-checkpointer")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._stopping.set()
+        await self._task
+        self._task = None
+
+    async def checkpoint(self) -> tuple[int, int, int]:
+        """Returns (busy, wal pages, checkpointed pages) as reported by SQLite."""
+        async with self.engine.connect() as conn:
+            result = await conn.exec_driver_sql(f"PRAGMA wal_checkpoint({self.mode.upper()})")
+            busy, log_pages, checkpointed = result.one()
+        return busy, log_pages, checkpointed
+
+    async def _run(self) -> None:
+        while not self._stopping.is_set():
+            with suppress(TimeoutError):
+                await asyncio.wait_for(self._stopping.wait(), timeout=self.interval)
+                return
+            try:
+                busy, log_pages, checkpointed = await self.checkpoint()
+            except Exception:
+                logger.warning("WAL checkpoint failed", exc_info=True)
+                continue
+            logger.debug("WAL checkpoint: busy=%d, wal=%d pages, checkpointed=%d", busy, log_pages, checkpointed)
+
+
+def get_checkpointer(engine: AsyncEngine, settings: Settings | None = None) -> WalCheckpointer | None:
+    settings = settings or get_settings()
+    if settings.db_journal_mode != JournalMode.WAL or settings.db_checkpoint_interval <= 0:
+        return None
+    return WalCheckpointer(engine, settings.db_checkpoint_interval, settings.db_checkpoint_mode)
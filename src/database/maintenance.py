@@ -0,0 +1,45 @@
+"""Database maintenance commands.
+
+bot-db counters verify    # exit status 1 if item_counters disagrees with items
+bot-db counters rebuild   # recompute item_counters from items
+"""
+
+import argparse
+import asyncio
+import sys
+
+from database.crud.counters import rebuild_item_counters, verify_item_counters
+from database.db import get_engine, get_session_factory
+
+
+async def counters(action: str) -> int:
+    engine = get_engine()
+    session_factory = get_session_factory(engine)
+    try:
+        async with session_factory() as session, session.begin():
+            if action == "rebuild":
+                rows = await rebuild_item_counters(session)
+                print(f"item_counters rebuilt: {rows} rows")
+                return 0
+            mismatches = await verify_item_counters(session)
+    finally:
+        await engine.dispose()
+
+    for (user_id, category, status, year), (stored, actual) in sorted(mismatches.items()):
+        print(f"user={user_id} {category.value}/{status.value}/{year}: stored={stored} actual={actual}")
+    print(f"item_counters: {len(mismatches)} mismatches")
+    return 1 if mismatches else 0
+
+
+def run_main() -> None:
+    parser = argparse.ArgumentParser(prog="bot-db", description="Database maintenance")
+    commands = parser.add_subparsers(dest="command", required=True)
+    counters_parser = commands.add_parser("counters", help="Check or rebuild the item_counters table")
+    counters_parser.add_argument("action", choices=["verify", "rebuild"])
+    args = parser.parse_args()
+
+    sys.exit(asyncio.run(counters(args.action)))
+
+
+if __name__ == "__main__":
+    run_main()
@@ -1,6 +1,21 @@
 from datetime import datetime
 
-from sqlalchemy import BigInteger, ForeignKey, String, func
+from sqlalchemy import (
+    JSON,
+    BigInteger,
+    ForeignKey,
+    Index,
+    Select,
+    String,
+    bindparam,
+    column,
+    event,
+    extract,
+    func,
+    select,
+    table,
+    text,
+)
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
 from bot.enums import Category, ItemStatus
@@ -10,6 +25,11 @@ class Base(DeclarativeBase):
     pass
 
 
+def title_key(title: str) -> str:
+    """What duplicate titles have in common: the text, but not its case or spacing."""
+    return " ".join(title.casefold().split())
+
+
 class User(Base):
     __tablename__ = "users"
 
@@ -26,10 +46,20 @@ class User(Base):
 
 class Item(Base):
     __tablename__ = "items"
+    __table_args__ = (
+        # Lists, per-category counts and yearly stats: equality on the first three columns, range/order on created_at
+        Index("ix_items_user_category_status_created", "user_id", "category", "status", "created_at"),
+        # Cross-category totals and logged years
+        Index("ix_items_user_status_created", "user_id", "status", "created_at"),
+        # Duplicate checks of a few titles
+        Index("ix_items_user_category_title_key", "user_id", "category", "title_key"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"))
     title: Mapped[str] = mapped_column(String(255))
+    # title_key(title), set wherever the title is
+    title_key: Mapped[str] = mapped_column(String(255))
     category: Mapped[Category]
     status: Mapped[ItemStatus] = mapped_column(default=ItemStatus.BACKLOG)
     created_at: Mapped[datetime] = mapped_column(server_default=func.now())
@@ -38,3 +68,140 @@ class Item(Base):
 
     def __repr__(self) -> str:
         return f"Item(id={self.id}, title={self.title}, status={self.status})"
+
+
+class ItemCounter(Base):
+    """Denormalized item counts, kept in sync with items by the triggers below."""
+
+    __tablename__ = "item_counters"
+    # Clustered on the primary key: reading a user's counters is a single range lookup
+    __table_args__ = {"sqlite_with_rowid": False}
+
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    category: Mapped[Category] = mapped_column(primary_key=True)
+    status: Mapped[ItemStatus] = mapped_column(primary_key=True)
+    year: Mapped[int] = mapped_column(primary_key=True)
+    count: Mapped[int] = mapped_column(default=0)
+
+    def __repr__(self) -> str:
+        return f"ItemCounter(user_id={self.user_id}, {self.category}/{self.status}/{self.year}={self.count})"
+
+
+class FsmRecord(Base):
+    """aiogram FSM state and data of one storage key."""
+
+    __tablename__ = "fsm_records"
+
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    state: Mapped[str | None] = mapped_column(String(255), nullable=True)
+    data: Mapped[dict] = mapped_column(JSON, default=dict)
+    updated_at: Mapped[datetime] = mapped_column(server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self) -> str:
+        return f"FsmRecord(key={self.key}, state={self.state})"
+
+
+def item_counts_query() -> Select:
+    """Counts computed from items, the source of truth for item_counters."""
+    year = extract("year", Item.created_at)
+    return select(Item.user_id, Item.category, Item.status, year, func.count(Item.id)).group_by(
+        Item.user_id, Item.category, Item.status, year
+    )
+
+
+def _counter_key(row: str) -> str:
+    return (
+        f"user_id = {row}.user_id AND category = {row}.category AND status = {row}.status "
+        f"AND year = CAST(strftime('%Y', {row}.created_at) AS INTEGER)"
+    )
+
+
+_INCREMENT = """
+    INSERT INTO item_counters (user_id, category, status, year, count)
+    VALUES (NEW.user_id, NEW.category, NEW.status, CAST(strftime('%Y', NEW.created_at) AS INTEGER), 1)
+    ON CONFLICT (user_id, category, status, year) DO UPDATE SET count = count + 1;
+"""
+_DECREMENT = f"""
+    UPDATE item_counters SET count = count - 1 WHERE {_counter_key("OLD")};
+    DELETE FROM item_counters WHERE {_counter_key("OLD")} AND count <= 0;
+"""
+ITEM_COUNTER_TRIGGERS = {
+    "item_counters_insert": f"AFTER INSERT ON items BEGIN {_INCREMENT} END",
+    "item_counters_delete": f"AFTER DELETE ON items BEGIN {_DECREMENT} END",
+    "item_counters_update": (
+        f"AFTER UPDATE OF user_id, category, status, created_at ON items BEGIN {_DECREMENT} {_INCREMENT} END"
+    ),
+}
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _create_item_counter_triggers(target, connection, **kw) -> None:
+    existing = set(connection.scalars(text("SELECT name FROM sqlite_master WHERE type = 'trigger'")))
+    if existing.issuperset(ITEM_COUNTER_TRIGGERS):
+        return
+
+    for name, body in ITEM_COUNTER_TRIGGERS.items():
+        connection.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+        connection.execute(text(f"CREATE TRIGGER {name} {body}"))
+
+    # Items written without the triggers are not counted yet
+    counters = ItemCounter.__table__
+    connection.execute(counters.delete())
+    connection.execute(counters.insert().from_select([c.name for c in counters.columns], item_counts_query()))
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _add_item_title_keys(target, connection, **kw) -> None:
+    columns = {row.name for row in connection.execute(text("PRAGMA table_info(items)"))}
+    if "title_key" in columns:
+        return
+
+    # Databases from before title_key: its index is created with the others (see init_db)
+    connection.execute(text("ALTER TABLE items ADD COLUMN title_key VARCHAR(255) NOT NULL DEFAULT ''"))
+    items = Item.__table__
+    rows = connection.execute(select(items.c.id, items.c.title)).all()
+    if rows:
+        connection.execute(
+            items.update().where(items.c.id == bindparam("item_id")).values(title_key=bindparam("key")),
+            [{"item_id": item_id, "key": title_key(title)} for item_id, title in rows],
+        )
+
+
+# Full-text index of item titles. External content: the text lives in items only, the index keeps
+# the tokens. user_id is indexed too, so a search reads the doclists of one user's matching items.
+ITEMS_FTS = "items_fts"
+# A prefix query of another length merges the doclists of every word it expands to, in all users' items
+SEARCH_PREFIX_LENGTHS = range(2, 11)
+_ITEMS_FTS_CREATE = f"""
+    CREATE VIRTUAL TABLE {ITEMS_FTS} USING fts5(
+        title, user_id, content='items', content_rowid='id', tokenize='unicode61 remove_diacritics 2',
+        prefix='{" ".join(map(str, SEARCH_PREFIX_LENGTHS))}'
+    )
+"""
+_FTS_INSERT = f"INSERT INTO {ITEMS_FTS} (rowid, title, user_id) VALUES (NEW.id, NEW.title, NEW.user_id);"
+_FTS_DELETE = (
+    f"INSERT INTO {ITEMS_FTS} ({ITEMS_FTS}, rowid, title, user_id) VALUES ('delete', OLD.id, OLD.title, OLD.user_id);"
+)
+ITEM_SEARCH_TRIGGERS = {
+    "items_fts_insert": f"AFTER INSERT ON items BEGIN {_FTS_INSERT} END",
+    "items_fts_delete": f"AFTER DELETE ON items BEGIN {_FTS_DELETE} END",
+    "items_fts_update": f"AFTER UPDATE OF title, user_id ON items BEGIN {_FTS_DELETE} {_FTS_INSERT} END",
+}
+
+items_fts = table(ITEMS_FTS, column("rowid"))
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _create_item_search_index(target, connection, **kw) -> None:
+    existing = set(connection.scalars(text("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")))
+    if existing.issuperset({ITEMS_FTS, *ITEM_SEARCH_TRIGGERS}):
+        return
+
+    if ITEMS_FTS not in existing:
+        connection.execute(text(_ITEMS_FTS_CREATE))
+    for name, body in ITEM_SEARCH_TRIGGERS.items():
+        connection.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+        connection.execute(text(f"CREATE TRIGGER {name} {body}"))
+
+    # Index items written without the triggers
+    connection.execute(text(f"INSERT INTO {ITEMS_FTS} ({ITEMS_FTS}) VALUES ('rebuild')"))
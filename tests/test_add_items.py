@@ -0,0 +1,74 @@
+"""Adding titles typed in the AddItem flow (bot.handlers.callbacks._add_items), one or many per message.
+
+Run with: uv run python -m unittest
+"""
+
+import unittest
+
+from sqlalchemy import select, text
+
+from bot.enums import Category, ItemStatus
+from bot.handlers.callbacks import _add_items
+from bot.main import init_db
+from database.crud.item import MAX_TITLE_LENGTH, create_item
+from database.models import Item
+from tests.utils import USER_ID, ScratchDbTest
+
+
+class AddItemsTest(ScratchDbTest):
+    async def _add(self, titles: list[str], category: Category = Category.BOOKS) -> list[str]:
+        async with self.session_factory() as session, session.begin():
+            return await _add_items(USER_ID, "\n".join(titles), category, ItemStatus.BACKLOG, session)
+
+    async def _titles(self, category: Category = Category.BOOKS) -> list[str]:
+        async with self.session_factory() as session:
+            result = await session.execute(select(Item.title).where(Item.category == category).order_by(Item.id))
+            return list(result.scalars())
+
+    async def test_skips_titles_already_in_the_category(self) -> None:
+        async with self.session_factory() as session, session.begin():
+            for title in ("Die Straße", "ﬁnal cut", "Ｔｏｋｙｏ Story", "Dune"):
+                await create_item(USER_ID, title, Category.BOOKS, session)
+
+        summary = await self._add(["die straße", "Die Strasse", "ﬁnal cut", "ｔｏｋｙｏ story", "DUNE", "Emma"])
+
+        self.assertEqual(summary, ["Added 1 to backlog!", "Skipped 5 already in books."])
+        self.assertEqual(await self._titles(), ["Die Straße", "ﬁnal cut", "Ｔｏｋｙｏ Story", "Dune", "Emma"])
+
+    async def test_adds_one_title_as_typed(self) -> None:
+        self.assertEqual(await self._add(["Dune"]), ["Added to backlog!"])
+        # Logged again, say after a re-read
+        self.assertEqual(await self._add(["dune"]), ["Added to backlog!"])
+        self.assertEqual(await self._add(["x" * (MAX_TITLE_LENGTH + 1)]), ["Added to backlog!"])
+        self.assertEqual(await self._titles(), ["Dune", "dune", "x" * MAX_TITLE_LENGTH])
+
+    async def test_skips_lines_over_the_length_limit(self) -> None:
+        summary = await self._add(["Dune", "x" * (MAX_TITLE_LENGTH + 1)])
+
+        self.assertEqual(summary, ["Added 1 to backlog!", f"Skipped 1 over {MAX_TITLE_LENGTH} characters."])
+        self.assertEqual(await self._titles(), ["Dune"])
+
+    async def test_finds_titles_added_before_title_keys(self) -> None:
+        async with self.session_factory() as session, session.begin():
+            await create_item(USER_ID, "Dune", Category.BOOKS, session)
+        # A database from before title_key
+        async with self.engine.begin() as conn:
+            await conn.execute(text("DROP INDEX ix_items_user_category_title_key"))
+            await conn.execute(text("ALTER TABLE items DROP COLUMN title_key"))
+        await init_db(self.engine)
+
+        summary = await self._add(["DUNE", "Emma"])
+
+        self.assertEqual(summary, ["Added 1 to backlog!", "Skipped 1 already in books."])
+
+    async def test_skips_repeats_within_a_message_and_not_across_categories(self) -> None:
+        await self._add(["Dune"], Category.MOVIES)
+
+        summary = await self._add(["Dune", "Dune", "Emma"])
+
+        self.assertEqual(summary, ["Added 2 to backlog!", "Skipped 1 already in books."])
+        self.assertEqual(await self._titles(), ["Dune", "Emma"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,36 @@
+"""FSM write-back after the handler (bot.middlewares.fsm_flush) when the write fails.
+
+Run with: uv run python -m unittest
+"""
+
+import unittest
+
+from bot.middlewares.fsm_flush import FsmFlushMiddleware
+
+
+class FailingStorage:
+    async def flush(self) -> None:
+        raise OSError("database is locked")
+
+
+class FsmFlushTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.middleware = FsmFlushMiddleware(FailingStorage())
+
+    async def test_returns_the_handler_result_when_the_flush_fails(self) -> None:
+        async def handler(event, data):
+            return "handled"
+
+        with self.assertLogs("bot.middlewares.fsm_flush", "ERROR"):
+            self.assertEqual(await self.middleware(handler, None, {}), "handled")
+
+    async def test_raises_the_handler_exception_when_the_flush_fails(self) -> None:
+        async def handler(event, data):
+            raise ValueError("handler failed")
+
+        with self.assertLogs("bot.middlewares.fsm_flush", "ERROR"), self.assertRaisesRegex(ValueError, "handler"):
+            await self.middleware(handler, None, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+"""Imports running in the background (bot.handlers.import_items._import_file) on a scratch database.
+
+Run with: uv run python -m unittest
+"""
+
+import unittest
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.methods import EditMessageText, SendMessage
+from aiogram.types import Document
+from sqlalchemy import select
+
+from bot.enums import Category
+from bot.handlers.import_items import _import_file
+from bot.internal.export import FileJobs
+from bot.internal.item_import import ImportOptions
+from database.models import Item
+from tests.utils import USER_ID, RecordingSession, ScratchDbTest
+
+FILE_ID = "items.txt"
+
+
+class ImportFileTest(ScratchDbTest):
+    async def asyncSetUp(self) -> None:
+        await super().asyncSetUp()
+        self.session = RecordingSession()
+        self.bot = Bot("42:TEST", session=self.session)
+        self.imports = FileJobs(max_concurrency=1)
+        self.assertTrue(self.imports.acquire())
+        self.report_message = await self.bot.send_message(USER_ID, "Importing items.txt")
+        self.session.methods.clear()
+
+    async def _import(self) -> None:
+        document = Document(file_id=FILE_ID, file_unique_id=FILE_ID, file_name=FILE_ID)
+        await _import_file(
+            self.report_message, USER_ID, document, ImportOptions(Category.BOOKS), self.session_factory, self.imports
+        )
+
+    def _last_report(self) -> str:
+        reports = [method for method in self.session.methods if isinstance(method, EditMessageText | SendMessage)]
+        return reports[-1].text
+
+    async def test_reports_the_items_added(self) -> None:
+        self.session.files[FILE_ID] = b"Dune\nEmma\ndune\n"
+
+        await self._import()
+
+        self.assertIn("<b>Imported items.txt</b>\n\nAdded: 2\nAlready there: 1", self._last_report())
+        async with self.session_factory() as session:
+            titles = (await session.execute(select(Item.title).order_by(Item.id))).scalars().all()
+        self.assertEqual(titles, ["Dune", "Emma"])
+        self.assertEqual(self.imports.running, 0)
+
+    async def test_reports_a_failed_download_and_frees_the_slot(self) -> None:
+        with self.assertRaises(TelegramBadRequest):
+            await self._import()
+
+        self.assertIn("<b>Import of items.txt stopped</b>", self._last_report())
+        self.assertEqual(self.imports.running, 0)
+
+    async def test_sends_the_report_again_once_its_message_is_deleted(self) -> None:
+        self.session.files[FILE_ID] = b"Dune\n"
+        self.session.deleted.add(self.report_message.message_id)
+
+        await self._import()
+
+        self.assertEqual(self.session.called[-2:], ["editMessageText", "sendMessage"])
+        self.assertIn("Added: 1", self._last_report())
+
+
+if __name__ == "__main__":
+    unittest.main()
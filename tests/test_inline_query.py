@@ -0,0 +1,47 @@
+"""Inline lookup (bot.handlers.inline_query) with its result cache, against a scratch database.
+
+Run with: uv run python -m unittest
+"""
+
+import unittest
+
+from aiogram.types import InlineQuery, User
+
+from bot.enums import Category
+from bot.handlers.inline_query import inline_lookup
+from bot.internal.search_cache import SearchCache
+from database.crud.item import create_item, update_item_title
+from tests.utils import USER_ID, ScratchDbTest
+
+
+class InlineLookupTest(ScratchDbTest):
+    async def asyncSetUp(self) -> None:
+        await super().asyncSetUp()
+        self.search_cache = SearchCache()
+        async with self.session_factory() as session, session.begin():
+            self.item_id = (await create_item(USER_ID, "Dune", Category.BOOKS, session)).id
+
+    async def _titles(self, query: str) -> list[str]:
+        inline_query = InlineQuery(
+            id="1", from_user=User(id=USER_ID, is_bot=False, first_name="Ann"), query=query, offset=""
+        )
+        async with self.session_factory() as session:
+            answer = await inline_lookup(inline_query, session, self.search_cache)
+        return [result.title for result in answer.results]
+
+    async def test_serves_queries_differing_in_case_from_the_cache(self) -> None:
+        self.assertEqual(await self._titles("Dune"), ["📚 Dune"])
+        self.assertEqual(await self._titles("DUNE"), ["📚 Dune"])
+        self.assertEqual((self.search_cache.misses, self.search_cache.hits), (1, 1))
+
+    async def test_drops_the_results_once_an_edit_commits(self) -> None:
+        self.assertEqual(await self._titles("dune"), ["📚 Dune"])
+        async with self.session_factory() as session, session.begin():
+            await update_item_title(self.item_id, "Emma", session)
+
+        self.assertEqual(await self._titles("dune"), [])
+        self.assertEqual(await self._titles("emma"), ["📚 Emma"])
+
+
+if __name__ == "__main__":
+    unittest.main()
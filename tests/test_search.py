@@ -0,0 +1,65 @@
+"""Title search (database.crud.item.search_items) against items_fts in a scratch database.
+
+Run with: uv run python -m unittest
+"""
+
+import unittest
+
+from bot.enums import Category
+from database.crud.item import SEARCH_CANDIDATES, NewItem, create_item, create_items, search_items
+from tests.utils import USER_ID, ScratchDbTest
+
+
+class SearchTest(ScratchDbTest):
+    async def _add(self, *titles: str) -> None:
+        async with self.session_factory() as session, session.begin():
+            for title in titles:
+                await create_item(USER_ID, title, Category.BOOKS, session)
+
+    async def _found(self, text: str) -> list[str]:
+        async with self.session_factory() as session:
+            return [item.title for item in await search_items(USER_ID, text, session)]
+
+    async def test_finds_non_ascii_titles(self) -> None:
+        await self._add("Die Straße", "ﬁnal cut", "Ｔｏｋｙｏ Story", "Amélie", "Война и мир")
+        for text, title in (
+            ("straße", "Die Straße"),
+            ("Straß", "Die Straße"),
+            ("ﬁnal", "ﬁnal cut"),
+            ("ﬁnal cu", "ﬁnal cut"),
+            ("Ｔｏｋｙｏ", "Ｔｏｋｙｏ Story"),
+            ("ｔｏｋ", "Ｔｏｋｙｏ Story"),
+            ("amelie", "Amélie"),
+            ("AMÉL", "Amélie"),
+            ("ВОЙНА мир", "Война и мир"),
+        ):
+            with self.subTest(text=text):
+                self.assertEqual(await self._found(text), [title])
+
+    async def test_takes_nothing_typed_for_query_syntax(self) -> None:
+        await self._add('Say "Hi"', "Rock 'n' Roll", "AND OR NOT")
+        for text, title in (('"hi', 'Say "Hi"'), ("rock 'n'", "Rock 'n' Roll"), ("and or", "AND OR NOT")):
+            with self.subTest(text=text):
+                self.assertEqual(await self._found(text), [title])
+        self.assertEqual(await self._found('"* ( ) : ^ -'), [])
+
+    async def test_ranks_whole_words_first(self) -> None:
+        await self._add("Dune", "Dunes of Arrakis", "Dune Messiah")
+        self.assertEqual(await self._found("dune"), ["Dune", "Dune Messiah", "Dunes of Arrakis"])
+        self.assertEqual(await self._found("dune m"), ["Dune Messiah", "Dune"])
+
+    async def test_takes_only_the_last_term_for_a_prefix(self) -> None:
+        await self._add("Dune Messiah", "Dunes of Arrakis")
+        self.assertEqual(await self._found("dune mess"), ["Dune Messiah"])
+        self.assertEqual(await self._found("dun messiah"), [])
+
+    async def test_finds_an_old_whole_word_match_behind_newer_prefix_matches(self) -> None:
+        await self._add("Dune")
+        async with self.session_factory() as session, session.begin():
+            newer = [NewItem(f"Dunes {n}", Category.BOOKS) for n in range(SEARCH_CANDIDATES + 50)]
+            await create_items(USER_ID, newer, session)
+        self.assertEqual((await self._found("dune"))[0], "Dune")
+
+
+if __name__ == "__main__":
+    unittest.main()
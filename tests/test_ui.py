@@ -0,0 +1,65 @@
+"""Main window rendering (bot.internal.ui) against a recording Bot API session.
+
+Run with: uv run python -m unittest
+"""
+
+import unittest
+from datetime import datetime
+
+from aiogram import Bot
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.types import CallbackQuery, Chat, Message, User
+
+from bot.internal.background import BackgroundTasks
+from bot.internal.ui import (
+    get_main_window,
+    render_main_window_from_callback,
+    render_main_window_from_message,
+)
+from tests.utils import USER_ID, RecordingSession
+
+TEXT = "Choose a category:"
+
+
+class MainWindowTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.session = RecordingSession()
+        self.background_tasks = BackgroundTasks()
+        self.bot = Bot("42:TEST", session=self.session)
+        self.state = FSMContext(MemoryStorage(), StorageKey(bot_id=42, chat_id=USER_ID, user_id=USER_ID))
+        # /start: the main window is sent as message 100
+        await render_main_window_from_message(self._message(1), self.state, self.background_tasks, text=TEXT)
+        self.session.methods.clear()
+
+    def _message(self, message_id: int) -> Message:
+        chat = Chat(id=USER_ID, type="private")
+        return Message(message_id=message_id, date=datetime.now(), chat=chat, text=TEXT).as_(self.bot)
+
+    def _tap(self, message_id: int) -> CallbackQuery:
+        user = User(id=USER_ID, is_bot=False, first_name="Ann")
+        callback = CallbackQuery(id="1", from_user=user, chat_instance="1", message=self._message(message_id))
+        return callback.as_(self.bot)
+
+    async def test_skips_an_unchanged_screen_tapped_on_the_main_window(self) -> None:
+        await render_main_window_from_callback(self._tap(100), self.state, self.background_tasks, text=TEXT)
+
+        self.assertEqual(self.session.called, [])
+        self.assertEqual(await get_main_window(self.state), (USER_ID, 100))
+
+    async def test_sends_an_unchanged_screen_again_once_the_main_window_is_deleted(self) -> None:
+        self.session.deleted.add(100)
+
+        # A button on an older message
+        rendered_to = await render_main_window_from_callback(
+            self._tap(50), self.state, self.background_tasks, text=TEXT
+        )
+
+        self.assertEqual(self.session.called, ["editMessageText", "sendMessage", "editMessageReplyMarkup"])
+        self.assertEqual(rendered_to, (USER_ID, 101))
+        self.assertEqual(await get_main_window(self.state), (USER_ID, 101))
+
+
+if __name__ == "__main__":
+    unittest.main()
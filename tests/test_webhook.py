@@ -0,0 +1,121 @@
+"""Webhook runtime (bot.internal.webhook) served by aiohttp's test server, posted recorded updates.
+
+Run with: uv run python -m unittest
+"""
+
+import asyncio
+import json
+import unittest
+from typing import Any
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Message
+from aiohttp import MultipartReader, web
+from aiohttp.test_utils import AioHTTPTestCase
+
+from bot.enums import RunMode
+from bot.internal.webhook import create_webhook_app
+from tests.utils import RecordingSession, make_settings
+
+SECRET = "s3cret"
+MAX_CONCURRENCY = 2
+
+
+def _message_update(update_id: int, text: str) -> dict[str, Any]:
+    """A private chat message update, as Telegram posts it."""
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 1760000000,
+            "chat": {"id": 1000 + update_id, "type": "private", "first_name": "Ann"},
+            "from": {"id": 1000 + update_id, "is_bot": False, "first_name": "Ann", "language_code": "en"},
+            "text": text,
+        },
+    }
+
+
+class WebhookTest(AioHTTPTestCase):
+    async def get_application(self) -> web.Application:
+        self.session = RecordingSession()
+        self.bot = Bot("42:TEST", session=self.session)
+        self.running = 0
+        self.most_running = 0
+        self.release = asyncio.Event()
+        self.release.set()
+
+        dp = Dispatcher()
+
+        @dp.message()
+        async def echo(message: Message):
+            self.running += 1
+            self.most_running = max(self.most_running, self.running)
+            try:
+                await self.release.wait()
+            finally:
+                self.running -= 1
+            return message.answer(f"echo: {message.text}")
+
+        settings = make_settings(
+            bot_run_mode=RunMode.WEBHOOK,
+            webhook_base_url="https://bot.example.com",
+            webhook_secret=SECRET,
+            webhook_max_concurrency=MAX_CONCURRENCY,
+        )
+        return create_webhook_app(dp, self.bot, settings)
+
+    async def _post(self, update: dict[str, Any], secret: str = SECRET):
+        return await self.client.post(
+            "/webhook", data=json.dumps(update), headers={"X-Telegram-Bot-Api-Secret-Token": secret}
+        )
+
+    async def _inline_method(self, response) -> dict[str, str]:
+        """Fields of the method returned in a webhook response, which is multipart form data."""
+        fields = {}
+        reader = MultipartReader.from_response(response)
+        while part := await reader.next():
+            fields[part.name] = await part.text()
+        return fields
+
+    async def test_sets_the_webhook_on_startup(self) -> None:
+        (method,) = self.session.methods
+        self.assertEqual(method.__api_method__, "setWebhook")
+        self.assertEqual(method.url, "https://bot.example.com/webhook")
+        self.assertEqual(method.secret_token, SECRET)
+        self.assertEqual(method.max_connections, MAX_CONCURRENCY)
+
+    async def test_rejects_a_wrong_secret_token(self) -> None:
+        for secret in ("wrong", ""):
+            response = await self._post(_message_update(1, "hi"), secret=secret)
+            self.assertEqual(response.status, 401)
+        self.assertEqual(self.most_running, 0)
+
+    async def test_returns_the_handler_method_inline(self) -> None:
+        response = await self._post(_message_update(1, "hi"))
+
+        self.assertEqual(response.status, 200)
+        fields = await self._inline_method(response)
+        self.assertEqual(fields["method"], "sendMessage")
+        self.assertEqual(fields["chat_id"], "1001")
+        self.assertEqual(fields["text"], "echo: hi")
+        # Answered in the response, not with a request of its own
+        self.assertEqual(self.session.called, ["setWebhook"])
+
+    async def test_limits_updates_in_flight(self) -> None:
+        self.release.clear()
+        posts = [asyncio.create_task(self._post(_message_update(n, "hi"))) for n in range(1, 2 * MAX_CONCURRENCY + 2)]
+        while self.running < MAX_CONCURRENCY:
+            await asyncio.sleep(0.01)
+        # Give the requests over the limit every chance to get in
+        await asyncio.sleep(0.1)
+        self.assertEqual(self.running, MAX_CONCURRENCY)
+        self.assertFalse(any(post.done() for post in posts))
+
+        self.release.set()
+        responses = await asyncio.gather(*posts)
+        self.assertEqual([response.status for response in responses], [200] * len(posts))
+        self.assertEqual(self.most_running, MAX_CONCURRENCY)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import itertools
+import tempfile
+import unittest
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.methods import EditMessageText, GetFile, SendMessage, TelegramMethod
+from aiogram.types import Chat, File, Message
+
+from bot.config import Settings
+from database.db import get_engine, get_session_factory
+from database.models import Base, User
+
+USER_ID = 1
+
+
+def make_settings(**overrides) -> Settings:
+    """Settings that don't read .env or the environment's bot token."""
+    return Settings(_env_file=None, **{"bot_token": "42:TEST", "bot_admin": 0, **overrides})
+
+
+class RecordingSession(BaseSession):
+    """Bot API session that sends nothing: records the methods called and answers them like Telegram.
+
+    sendMessage returns a message with the next id, edits of the ids in deleted fail as they do once
+    the user deleted the message, files are downloaded from files by file id, and anything else
+    returns True.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.methods: list[TelegramMethod[Any]] = []
+        self.deleted: set[int] = set()
+        self.files: dict[str, bytes] = {}
+        self._message_ids = itertools.count(100)
+
+    @property
+    def called(self) -> list[str]:
+        return [method.__api_method__ for method in self.methods]
+
+    async def make_request(self, bot: Bot, method: TelegramMethod[Any], timeout: int | None = None) -> Any:
+        self.methods.append(method)
+        if isinstance(method, SendMessage):
+            chat = Chat(id=method.chat_id, type="private")
+            message = Message(message_id=next(self._message_ids), date=datetime.now(), chat=chat, text=method.text)
+            return message.as_(bot)
+        if isinstance(method, EditMessageText) and method.message_id in self.deleted:
+            raise TelegramBadRequest(method, "Bad Request: message to edit not found")
+        if isinstance(method, GetFile):
+            if method.file_id not in self.files:
+                raise TelegramBadRequest(method, "Bad Request: invalid file_id")
+            return File(file_id=method.file_id, file_unique_id=method.file_id, file_path=method.file_id)
+        return True
+
+    async def stream_content(self, url: str, *args: Any, **kwargs: Any):
+        yield self.files[url.rsplit("/", 1)[-1]]
+
+    async def close(self) -> None:
+        pass
+
+
+class ScratchDbTest(unittest.IsolatedAsyncioTestCase):
+    """A fresh database in a temporary directory for every test, with the user USER_ID in it."""
+
+    async def asyncSetUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.engine = get_engine(make_settings(db_path=Path(tmp.name) / "test.db"))
+        self.addAsyncCleanup(self.engine.dispose)
+        async with self.engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+        self.session_factory = get_session_factory(self.engine)
+        async with self.session_factory() as session, session.begin():
+            session.add(User(id=USER_ID, fullname="Ann"))